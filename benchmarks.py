@@ -0,0 +1,732 @@
+"""Benchmarks for the deck tooling. Run with the name of a benchmark and its optional arguments, e.g.
+python benchmarks.py parser deck_lists
+"""
+
+import glob
+import http.server
+import os
+import random
+import re
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import date
+
+import numpy as np
+
+from card_names import NameIndex
+from card_plot import cmap, edge_colors, face_colors, frame_codes, get_plot_data
+from card_search import decks_dir, get_html_from_file, parse_deck_list
+from card_synergy import SynergyEngine
+from deck_compliance import ComplianceEngine
+from deck_corpus import DeckCorpus, corpus_file
+from deck_matrix import DeckMatrix
+from deck_similarity import DeckSimilarity
+from tests.ledger_fixtures import serve_ledger, synthetic_ledger_page
+
+
+def synthetic_deck_page(n_cards: int = 100, padding: int = 200_000) -> str:
+    """Build a page shaped like a TappedOut deck page, with the list buried in markup"""
+
+    cards = [
+        f"1 Card &amp; Name {random.randrange(30_000)}, the &#39;{i}&#39;"
+        for i in range(n_cards)
+    ]
+    filler = '<div class="x"><a href="/y">text</a></div>\n' * (padding // 44)
+    return (
+        filler[: len(filler) // 2]
+        + f'<input type="hidden" name="c" value="{"||".join(cards)}">'
+        + filler[len(filler) // 2 :]
+    )
+
+
+def parse_deck_list_reference(html: str) -> list[str]:
+    """The original regex + BeautifulSoup deck list parser, kept for comparison"""
+
+    import re
+
+    from bs4 import BeautifulSoup
+
+    start = r'<input type="hidden" name="c" value="'
+    end = r'">'
+
+    if match := re.search(f"{start}(.*?){end}", html):
+        raw_string = match.group(1)
+        return BeautifulSoup(raw_string, features="html.parser").get_text().split("||")
+    else:
+        return []
+
+
+def bench_parser(deck_dir: str = decks_dir) -> None:
+    """Compare the str.find parser with the regex + BeautifulSoup one on saved pages"""
+
+    files = glob.glob(os.path.join(deck_dir, "*.html"))
+    if files:
+        pages = [get_html_from_file(file) for file in files]
+        print(f"Loaded {len(pages)} pages from {deck_dir}")
+    else:
+        pages = [synthetic_deck_page() for _ in range(500)]
+        print(f"No pages in {deck_dir}; generated {len(pages)} synthetic pages")
+
+    timings = {}
+    results = {}
+    for name, parser in (
+        ("reference", parse_deck_list_reference),
+        ("find", parse_deck_list),
+    ):
+        start = time.perf_counter()
+        results[name] = [parser(page) for page in pages]
+        timings[name] = time.perf_counter() - start
+        print(f"    {name}: {timings[name]:.3f} s")
+
+    mismatches = sum(a != b for a, b in zip(results["reference"], results["find"]))
+    print(f"    Speedup: {timings['reference'] / timings['find']:.1f}x")
+    print(f"    Mismatched deck lists: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+def synthetic_card_names(n: int) -> list[str]:
+    """Random multi-word names with roughly the length distribution of real cards"""
+
+    words = [
+        "".join(random.choices(string.ascii_lowercase, k=random.randint(3, 9)))
+        for _ in range(2000)
+    ]
+    return [" ".join(random.choices(words, k=random.randint(1, 4))) for _ in range(n)]
+
+
+def bench_names(n_names: str = "30000", n_queries: str = "1000") -> None:
+    """Time prefix completion and fuzzy lookup on a name index"""
+
+    names = synthetic_card_names(int(n_names))
+    start = time.perf_counter()
+    index = NameIndex(names)
+    print(f"Indexed {len(index)} names in {time.perf_counter() - start:.2f} s")
+
+    queries = random.sample(names, int(n_queries))
+    typos = []
+    for name in queries:
+        i = random.randrange(len(name))
+        typos.append(name[:i] + random.choice(string.ascii_lowercase) + name[i + 1 :])
+
+    for label, lookup, inputs in (
+        (
+            "prefix",
+            index.complete,
+            [name[: max(1, len(name) // 2)] for name in queries],
+        ),
+        ("fuzzy", index.fuzzy, typos),
+    ):
+        start = time.perf_counter()
+        results = [lookup(query) for query in inputs]
+        elapsed = time.perf_counter() - start
+        print(f"    {label}: {1e3 * elapsed / len(inputs):.3f} ms per query")
+
+    found = sum(name in result for name, result in zip(queries, results))
+    print(f"    Fuzzy lookups recovering the original name: {found}/{len(queries)}")
+
+
+def synthetic_decks(n_decks: int, cluster_size: int = 5) -> dict[str, list[str]]:
+    """Random 100-card decks in small clusters of near-duplicates (a few cards swapped)"""
+
+    decks = {}
+    for i in range(n_decks):
+        if i % cluster_size == 0:
+            base = [f"card {random.randrange(30_000)}" for _ in range(100)]
+        deck = list(base)
+        for _ in range(random.randint(0, 5)):
+            deck[random.randrange(100)] = f"card {random.randrange(30_000)}"
+        decks[f"deck {i}"] = deck
+
+    return decks
+
+
+def bench_similarity(max_decks: str = "50000") -> None:
+    """Time MinHash/LSH indexing and all-pairs search at doubling corpus sizes"""
+
+    n = 6250
+    while n <= int(max_decks):
+        matrix = DeckMatrix(synthetic_decks(n))
+
+        start = time.perf_counter()
+        similarity = DeckSimilarity(matrix)
+        indexed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pairs = similarity.pairs(0.8)
+        paired = time.perf_counter() - start
+
+        start = time.perf_counter()
+        similarity.similar(matrix.decks[0])
+        queried = time.perf_counter() - start
+
+        print(
+            f"    {n} decks: index {indexed:.2f} s, pairs >= 0.8 {paired:.2f} s",
+            f"({len(pairs)} found), top-10 query {1e3 * queried:.1f} ms",
+        )
+        n *= 2
+
+
+def cooccurrence_reference(matrix: DeckMatrix, card: str) -> np.ndarray:
+    """Co-occurrence counts from one mask over every entry of the matrix"""
+
+    rows, indices = matrix.rows, matrix.indices
+    with_card = np.zeros(matrix.n_decks, dtype=bool)
+    with_card[rows[indices == matrix.vocab[card]]] = True
+    return np.bincount(indices[with_card[rows]], minlength=matrix.n_cards)
+
+
+def partner_counts(engine: SynergyEngine, card: str) -> dict[str, int]:
+    """Nonzero co-occurrence counts by card name, comparable across vocabularies"""
+
+    co = engine.counts(card)
+    return {engine.matrix.cards[id]: int(co[id]) for id in np.flatnonzero(co)}
+
+
+def bench_synergy(max_decks: str = "50000", n_queries: str = "100") -> None:
+    """Time top-partner queries at doubling corpus sizes, against a full scan per query,
+    and an incremental update against rebuilding the engine
+    """
+
+    n = 6250
+    while n <= int(max_decks):
+        decks = synthetic_decks(n)
+        matrix = DeckMatrix(decks)
+        engine = SynergyEngine(matrix, cache_size=0)
+        queries = random.sample(matrix.cards, int(n_queries))
+
+        start = time.perf_counter()
+        for card in queries:
+            cooccurrence_reference(matrix, card)
+        scanned = time.perf_counter() - start
+
+        start = time.perf_counter()
+        engine.counts(queries[0])
+        indexed = time.perf_counter() - start
+        start = time.perf_counter()
+        for card in queries:
+            engine.top_partners(card)
+        queried = time.perf_counter() - start
+
+        same = all(
+            np.array_equal(
+                matrix.cooccurrence(card), cooccurrence_reference(matrix, card)
+            )
+            for card in queries[:10]
+        )
+        print(
+            f"    {n} decks: full scan {1e3 * scanned / len(queries):.2f} ms per card,",
+            f"top-10 query {1e3 * queried / len(queries):.2f} ms",
+            f"(column index built in {1e3 * indexed:.0f} ms); same counts: {same}",
+        )
+
+        # Re-parse 1% of the decks and add as many new ones, with a full count cache
+        engine = SynergyEngine(matrix)
+        for card in random.sample(matrix.cards, engine.cache_size):
+            engine.counts(card)
+        changed = dict(
+            zip(
+                (f"deck {i}" for i in range(n - n // 100, n + n // 100)),
+                synthetic_decks(n // 50).values(),
+            )
+        )
+
+        start = time.perf_counter()
+        engine.add_decks(changed)
+        updated = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rebuilt = SynergyEngine(DeckMatrix({**decks, **changed}))
+        for card in engine.cache:
+            rebuilt.counts(card)
+        rebuild = time.perf_counter() - start
+
+        same = all(
+            partner_counts(engine, card) == partner_counts(rebuilt, card)
+            for card in list(engine.cache)[:10]
+        )
+        print(
+            f"        update with {len(changed)} decks: {1e3 * updated:.0f} ms,",
+            f"rebuild {1e3 * rebuild:.0f} ms; same counts: {same}",
+        )
+        n *= 2
+
+
+def compliance_reference(
+    deck_dict: dict[str, list[str]], watch_lists: dict[str, list[str]]
+) -> dict[str, dict[str, list[str]]]:
+    """Offending cards per deck and watch list by set intersection, one deck at a time"""
+
+    sets = {name: set(cards) for name, cards in watch_lists.items()}
+    return {
+        deck: {name: sorted(set(deck_list) & cards) for name, cards in sets.items()}
+        for deck, deck_list in deck_dict.items()
+    }
+
+
+def bench_compliance(max_decks: str = "40000", n_lists: str = "3") -> None:
+    """Compare the bitset compliance engine with per-deck set intersection"""
+
+    n = 5000
+    while n <= int(max_decks):
+        deck_dict = synthetic_decks(n)
+        watch_lists = {
+            f"list {j}": [f"card {random.randrange(30_000)}" for _ in range(300)]
+            for j in range(int(n_lists))
+        }
+        matrix = DeckMatrix(deck_dict)
+
+        start = time.perf_counter()
+        expected = compliance_reference(deck_dict, watch_lists)
+        reference = time.perf_counter() - start
+
+        start = time.perf_counter()
+        report = ComplianceEngine(watch_lists).check(matrix)
+        engine = time.perf_counter() - start
+
+        matches = all(
+            sorted(report.cards(deck, name)) == cards
+            for deck, by_list in expected.items()
+            for name, cards in by_list.items()
+        )
+        print(
+            f"    {n} decks, {n_lists} lists: sets {1e3 * reference:.0f} ms,",
+            f"bitsets {1e3 * engine:.0f} ms; reports match: {matches}",
+        )
+        n *= 2
+
+
+def plot_data_reference(
+    frame_dict: dict[str, dict[str, int]], min_count: int, include_lands: bool
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """The original make_plot data path, growing arrays with np.append per frame"""
+
+    names, colors, edges, counts = (
+        np.array([]),
+        np.array([]),
+        np.array([]),
+        np.array([]),
+    )
+
+    for frame in cmap:
+        if (frame != "L" or include_lands) and frame_dict[frame] != {}:
+            temp = np.array(list(frame_dict[frame].items()))
+            names = np.append(names, temp.T[0])
+            colors = np.append(colors, [cmap[frame]] * len(temp))
+            edges = np.append(
+                edges, ["black" if frame == "W" else cmap[frame]] * len(temp)
+            )
+            counts = np.append(counts, temp.T[1].astype(int))
+
+    names = names[counts >= min_count]
+    colors = colors[counts >= min_count]
+    edges = edges[counts >= min_count]
+    counts = counts[counts >= min_count]
+
+    sorting = np.argsort(names)
+    return names[sorting], colors[sorting], edges[sorting], counts[sorting]
+
+
+def plot_data_columnar(
+    frame_dict: dict[str, dict[str, int]], min_count: int, include_lands: bool
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    data = get_plot_data(frame_dict, min_count, include_lands)
+    return (
+        data["name"],
+        face_colors[data["frame"]],
+        edge_colors[data["frame"]],
+        data["count"],
+    )
+
+
+def bench_plot_data(max_cards: str = "50000") -> None:
+    """Time and peak memory of assembling the bar graph data from a frame dictionary"""
+
+    n = 12500
+    while n <= int(max_cards):
+        frame_dict = {frame: {} for frame in frame_codes}
+        for i in range(n):
+            frame = random.choice(frame_codes)
+            frame_dict[frame][f"card {i} {frame}"] = random.randint(1, 20)
+
+        print(f"    {n} cards:")
+        results = {}
+        for label, assemble in (
+            ("reference", plot_data_reference),
+            ("columnar", plot_data_columnar),
+        ):
+            tracemalloc.start()
+            start = time.perf_counter()
+            results[label] = assemble(frame_dict, 2, True)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"        {label}: {elapsed:.3f} s, peak {peak / 1e6:.1f} MB")
+
+        same = all(
+            np.array_equal(a, b.astype(a.dtype))
+            for a, b in zip(results["reference"], results["columnar"])
+        )
+        print(f"        Identical output: {same}")
+        n *= 2
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Cumulative import time in microseconds of every module loaded by importing one,
+    as reported by python -X importtime
+    """
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+def menu_times(answers: str, cwd: str) -> tuple[float, list[str]]:
+    """Wall time of running the card_search menu with the given answers, and the
+    modules it imported
+    """
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "card_search.py")
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", script],
+        input=answers,
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=cwd,
+    )
+    elapsed = time.perf_counter() - start
+
+    modules = [
+        line.rsplit("|", 1)[1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and "cumulative" not in line
+    ]
+    return elapsed, modules
+
+
+def bench_startup(max_ms: str = "100", runs: str = "5") -> None:
+    """Regression check on the startup time of the menu-driven scripts.
+    Fails if importing card_search takes longer than max_ms, if running its S or G
+    menu option on a small deck list takes more than max_ms over a bare
+    interpreter, or if either pulls in a heavy dependency that only other menu
+    options need.
+    """
+
+    heavy = ("numpy", "requests", "matplotlib", "aiohttp", "concurrent.futures")
+    failed = False
+
+    for module in ("card_search", "card_plot"):
+        best = min(
+            (import_times(module) for _ in range(int(runs))), key=lambda t: t[module]
+        )
+        print(f"    {module}: {best[module] / 1e3:.1f} ms")
+        for name, us in sorted(best.items(), key=lambda item: -item[1])[1:6]:
+            print(f"        {name}: {us / 1e3:.1f} ms")
+
+        if module == "card_search":
+            loaded = [name for name in heavy if name in best]
+            if best[module] / 1e3 > float(max_ms) or loaded:
+                print(f"    FAIL: over {max_ms} ms or loaded {', '.join(loaded)}")
+                failed = True
+
+    bare = []
+    for _ in range(int(runs)):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        bare.append(time.perf_counter() - start)
+    print(f"    Bare interpreter: {1e3 * min(bare):.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.mkdir(os.path.join(tmp, decks_dir))
+        deck_dict = synthetic_decks(100)
+        for deck, deck_list in deck_dict.items():
+            deck_list.append("sol ring")
+            with open(os.path.join(tmp, decks_dir, deck + ".txt"), "w") as f:
+                f.write("\n".join(deck_list) + "\n")
+        with DeckCorpus(os.path.join(tmp, decks_dir, corpus_file)) as corpus:
+            corpus.update(deck_dict)
+        with open(os.path.join(tmp, "deck_urls.txt"), "w") as f:
+            f.write("\n".join(deck_dict) + "\n")
+        shutil.copy(
+            os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), "gamechangers.txt"
+            ),
+            tmp,
+        )
+
+        for option, answers in (("S", "S\nsol ring\n\nQ\n"), ("G", "G\nQ\n")):
+            results = [menu_times(answers, tmp) for _ in range(int(runs))]
+            elapsed = min(elapsed for elapsed, _ in results)
+            loaded = [name for name in heavy if name in results[-1][1]]
+            overhead = 1e3 * (elapsed - min(bare))
+            print(
+                f"    Menu option {option}: {1e3 * elapsed:.1f} ms",
+                f"({overhead:.1f} ms over the bare interpreter)",
+            )
+            if overhead > float(max_ms) or loaded:
+                print(f"    FAIL: over {max_ms} ms or loaded {', '.join(loaded)}")
+                failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+def bench_ledger_parse(n_transactions: str = "100000", per_page: str = "200") -> None:
+    """Time parse_ledger_page on a synthetic ledger, and the precompiled regex scan
+    that was tried in place of its splitting, finding the label and value fields only.
+    A full parser built on the scan measured within noise of the split-based one
+    (23.2-23.6 against 23.0-24.8 µs per transaction), because interpreting the
+    fields takes most of the time either way, so the split-based parser was kept.
+    """
+
+    from puca_audit import parse_ledger_page
+
+    field = r"([^<]*(?:<(?!/div>)[^<]*)*)</div>"
+    scan = re.compile(
+        rf'<div class="(?:(column sender)"|(label)[^>]*>{field}|value[^>]*>{field})'
+    )
+
+    n_pages = int(n_transactions) // int(per_page)
+    pages = [
+        synthetic_ledger_page(int(per_page), f"{2012 + i // 12}-{i % 12 + 1:02d}")
+        for i in range(n_pages)
+    ]
+    n = n_pages * int(per_page)
+    print(f"    {n_pages} pages, {n} transactions")
+
+    start = time.perf_counter()
+    for page in pages:
+        parse_ledger_page(page)
+    elapsed = time.perf_counter() - start
+    print(
+        f"    Split-based parser: {elapsed:.2f} s ({1e6 * elapsed / n:.1f} µs per transaction)"
+    )
+
+    start = time.perf_counter()
+    for page in pages:
+        scan.findall(page.encode("ascii", "ignore").decode("ascii"))
+    elapsed = time.perf_counter() - start
+    print(
+        f"    Regex field scan alone: {elapsed:.2f} s ({1e6 * elapsed / n:.1f} µs per transaction)"
+    )
+
+
+def bench_ledger_store(n_transactions: str = "100000") -> None:
+    """Memory of a parsed ledger held as Transaction objects or as a TransactionTable,
+    and the time and size of saving it as CSV or as the binary table
+    """
+
+    from puca_audit import LedgerExport, TransactionTable, parse_ledger_page
+
+    pages = [
+        synthetic_ledger_page(200, f"{2012 + i // 12}-{i % 12 + 1:02d}")
+        for i in range(int(n_transactions) // 200)
+    ]
+    print(f"    {len(pages) * 200} transactions")
+
+    tracemalloc.start()
+    transactions = [t for page in pages for t in parse_ledger_page(page)]
+    objects = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    table = TransactionTable()
+    tracemalloc.start()
+    for t in transactions:
+        table.add(t)
+    columns = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"    Transaction objects: {objects / 1e6:.1f} MB")
+    print(f"    Table: {columns / 1e6:.1f} MB ({len(table.strings)} distinct strings)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "ledger.csv")
+        start = time.perf_counter()
+        export = LedgerExport(csv_path)
+        for t in transactions:
+            export.add(t)
+        export.close()
+        print(
+            f"    CSV: saved in {time.perf_counter() - start:.2f} s,",
+            f"{os.path.getsize(csv_path) / 1e6:.1f} MB",
+        )
+
+        table_path = os.path.join(tmp, "ledger.bin")
+        start = time.perf_counter()
+        table.save(table_path)
+        saved = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = TransactionTable.load(table_path)
+        print(
+            f"    Table: saved in {saved:.2f} s, loaded in",
+            f"{time.perf_counter() - start:.3f} s,",
+            f"{os.path.getsize(table_path) / 1e6:.1f} MB",
+        )
+
+    matches = all(
+        a.csv_row() == b.csv_row() and a.ledger_type == b.ledger_type
+        for a, b in zip(transactions, loaded)
+    )
+    print(
+        f"    Same transactions after loading: {matches and len(loaded) == len(transactions)}"
+    )
+
+
+def bench_ledger_crawl(n_months: str = "36", latency_ms: str = "100") -> None:
+    """Time a full ledger crawl from a local server with 1, 4 and 8 workers, and
+    a second crawl reading the closed months from the page cache
+    """
+
+    import puca_audit
+    from requests import Session
+
+    months = [f"{2015 + i // 12}-{i % 12 + 1:02d}" for i in range(int(n_months))]
+    pages = {month: synthetic_ledger_page(40, month) for month in months}
+    server = serve_ledger(pages, 2 * float(latency_ms) / 1e3)
+    urls = [f"{server.url}/account/ledger/{month}" for month in months]
+
+    session = Session()
+    session.post(server.url + "/login", data={"login": "me", "password": "pw"})
+    print(f"    {len(months)} months, {latency_ms} ms per page on average")
+
+    exports = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in (1, 4, 8):
+            export = puca_audit.LedgerExport(os.path.join(tmp, f"{workers}.csv"))
+            start = time.perf_counter()
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                puca_audit.crawl_ledger(session, urls, [export], workers)
+            export.close()
+            print(f"    {workers} workers: {time.perf_counter() - start:.2f} s")
+            with open(export.csvfilename) as f:
+                exports.append(f.read())
+
+        # Pretend it is the last month, so all but it and the month before are closed
+        year, month = map(int, months[-1].split("-"))
+        today = date(year, month, 15)
+        for run in ("first", "second"):
+            cache = puca_audit.LedgerCache("me", os.path.join(tmp, "cache"), today)
+            server.fetched.clear()
+            start = time.perf_counter()
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                puca_audit.crawl_ledger(session, urls, [], cache=cache)
+            print(
+                f"    Cached crawl, {run} run: {time.perf_counter() - start:.2f} s,",
+                f"{sum(server.fetched.values())} pages downloaded",
+            )
+
+    server.shutdown()
+    print(f"    Same export from every crawl: {len(set(exports)) == 1}")
+
+
+def serve_deck_pages(pages: dict[str, bytes], latency: float) -> http.server.HTTPServer:
+    """Serve synthetic deck pages from a local thread, each after latency seconds"""
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            body = pages[self.path.rsplit("/", 1)[-1]]
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_pipeline(n_decks: str = "400", latency_ms: str = "50") -> None:
+    """Compare a full refresh as separate download and parse passes with the
+    overlapping download -> parse -> store pipeline, against a local server
+    """
+
+    import card_search
+    import deck_pipeline
+
+    # The shared rate limit would dominate; the server latency stands in for the network
+    card_search.download_rate = deck_pipeline.download_rate = 1e6
+
+    deck_names = [f"deck-{i}" for i in range(int(n_decks))]
+    pages = {deck: synthetic_deck_page().encode() for deck in deck_names}
+    server = serve_deck_pages(pages, float(latency_ms) / 1e3)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    network = len(pages) * float(latency_ms) / 1e3 / card_search.download_workers
+
+    with tempfile.TemporaryDirectory() as sequential_dir:
+        start = time.perf_counter()
+        card_search.get_deck_lists(sequential_dir, base_url, False, deck_names)
+        downloaded = time.perf_counter() - start
+        card_search.parse_deck_lists(sequential_dir, False, deck_names)
+        sequential = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as pipeline_dir:
+        start = time.perf_counter()
+        result = card_search.run_pipeline(
+            pipeline_dir, base_url, False, False, deck_names
+        )
+        pipelined = time.perf_counter() - start
+
+    server.shutdown()
+    timings = result["timings"]
+    print(
+        f"    {len(pages)} decks, {latency_ms} ms latency (network floor {network:.1f} s)"
+    )
+    print(
+        f"    Sequential: {sequential:.2f} s",
+        f"(download {downloaded:.2f} s, parse {sequential - downloaded:.2f} s)",
+    )
+    print(
+        f"    Pipeline:   {pipelined:.2f} s",
+        f"(download {timings['download']:.2f} s, parse {timings['parse']:.2f} s CPU,",
+        f"store {timings['store']:.2f} s, blocked {timings['blocked']:.2f} s)",
+    )
+
+
+benchmarks = {
+    "parser": bench_parser,
+    "names": bench_names,
+    "similarity": bench_similarity,
+    "synergy": bench_synergy,
+    "plot-data": bench_plot_data,
+    "compliance": bench_compliance,
+    "startup": bench_startup,
+    "pipeline": bench_pipeline,
+    "ledger-parse": bench_ledger_parse,
+    "ledger-crawl": bench_ledger_crawl,
+    "ledger-store": bench_ledger_store,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in benchmarks:
+        print(f"Usage: python benchmarks.py {{{','.join(benchmarks)}}} [args]")
+        sys.exit(2)
+
+    benchmarks[sys.argv[1]](*sys.argv[2:])
@@ -0,0 +1,150 @@
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+
+# Global variables
+cache_file = "card_cache.db"
+card_fields = ("type_line", "colors", "color_identity")
+face_fields = ("type_line", "colors")
+
+
+def slim_card(card: dict) -> dict:
+    """Keep only the ScryFall fields the frame classification uses"""
+
+    slim = {key: card[key] for key in card_fields if key in card}
+    if "card_faces" in card:
+        slim["card_faces"] = [
+            {key: face[key] for key in face_fields if key in face}
+            for face in card["card_faces"]
+        ]
+
+    return slim
+
+
+class CardCache:
+    """On-disk cache of ScryFall card metadata keyed by normalized card name.
+    Entries expire after ttl seconds, the least recently used entries are evicted
+    once there are more than max_entries, and the hot_size most recently used
+    entries are also kept in memory. Only card objects are stored; names ScryFall
+    doesn't know are looked up again next time.
+    """
+
+    def __init__(
+        self,
+        path: str = cache_file,
+        ttl: float = 30 * 24 * 3600,
+        max_entries: int = 100_000,
+        hot_size: int = 4096,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hot_size = hot_size
+        self.hot = OrderedDict()
+        self.touched = {}
+
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS cards (name TEXT PRIMARY KEY, data TEXT NOT NULL,"
+            " fetched REAL NOT NULL, used REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS cards_used ON cards (used)")
+
+    def __enter__(self) -> "CardCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.flush()
+        self.db.close()
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+
+    def remember(self, name: str, data: dict, fetched: float) -> None:
+        self.hot[name] = (data, fetched)
+        self.hot.move_to_end(name)
+        if len(self.hot) > self.hot_size:
+            self.hot.popitem(last=False)
+
+    def get(self, card: str) -> dict:
+        """Return the cached metadata for a card, or None if missing or expired"""
+
+        name = card.strip().lower()
+        now = time.time()
+
+        if name in self.hot:
+            data, fetched = self.hot[name]
+        else:
+            row = self.db.execute(
+                "SELECT data, fetched FROM cards WHERE name = ?", (name,)
+            ).fetchone()
+            if row is None:
+                return None
+            data, fetched = json.loads(row[0]), row[1]
+
+        if now - fetched > self.ttl:
+            self.hot.pop(name, None)
+            return None
+
+        # Last-use times are written in batches rather than on every lookup
+        self.remember(name, data, fetched)
+        self.touched[name] = now
+        return data
+
+    def put(self, card: str, data: dict) -> dict:
+        """Store the metadata of a card fetched from ScryFall and return the slimmed copy,
+        or None if data is an error rather than a card
+        """
+
+        return self.put_many({card: data}).get(card)
+
+    def put_many(self, cards: dict[str, dict]) -> dict[str, dict]:
+        """Store the metadata of many cards in one transaction, returning the slimmed copies.
+        Anything but a card object (such as a not-found error) is left out.
+        """
+
+        now = time.time()
+        slimmed = {
+            card: slim_card(data)
+            for card, data in cards.items()
+            if data.get("object") == "card"
+        }
+
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO cards (name, data, fetched, used)"
+                " VALUES (?, ?, ?, ?)",
+                (
+                    (card.strip().lower(), json.dumps(slim), now, now)
+                    for card, slim in slimmed.items()
+                ),
+            )
+
+        for card, slim in slimmed.items():
+            name = card.strip().lower()
+            self.remember(name, slim, now)
+            self.touched.pop(name, None)
+
+        return slimmed
+
+    def flush(self) -> None:
+        """Write pending last-use times and evict the least recently used entries"""
+
+        with self.db:
+            self.db.executemany(
+                "UPDATE cards SET used = ? WHERE name = ?",
+                ((used, name) for name, used in self.touched.items()),
+            )
+            self.touched.clear()
+
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                self.db.execute(
+                    "DELETE FROM cards WHERE name IN"
+                    " (SELECT name FROM cards ORDER BY used LIMIT ?)",
+                    (excess,),
+                )
+                self.hot.clear()
@@ -0,0 +1,148 @@
+from collections import Counter
+from typing import Iterable
+
+# Global variables
+gc_file = "gamechangers.txt"
+
+
+def trigrams(name: str) -> set[str]:
+    """Overlapping three-letter pieces of a name, padded so short names still have some"""
+
+    padded = f"  {name} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Levenshtein distance between a and b, giving up with max_distance + 1 once
+    every path is already further apart than max_distance
+    """
+
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+
+    return previous[-1]
+
+
+class NameIndex:
+    """Prefix trie and trigram index over card names for autocomplete and typo-tolerant lookup.
+    Names are lowercased; the trie is nested dicts with the complete name stored under "$".
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.names = []
+        self.ids = {}
+        self.trie = {}
+        self.grams = {}
+        for name in names:
+            self.add(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name.strip().lower() in self.ids
+
+    def add(self, name: str) -> None:
+        name = name.strip().lower()
+        if not name or name in self.ids:
+            return
+
+        id = len(self.names)
+        self.ids[name] = id
+        self.names.append(name)
+
+        node = self.trie
+        for char in name:
+            node = node.setdefault(char, {})
+        node["$"] = name
+
+        for gram in trigrams(name):
+            self.grams.setdefault(gram, []).append(id)
+
+    def complete(self, prefix: str, limit: int = 10) -> list[str]:
+        """Names starting with prefix, in alphabetical order"""
+
+        prefix = prefix.strip().lower()
+        node = self.trie
+        for char in prefix:
+            if char not in node:
+                return []
+            node = node[char]
+
+        results = []
+        stack = [node]
+        while stack and len(results) < limit:
+            node = stack.pop()
+            if "$" in node:
+                results.append(node["$"])
+            stack.extend(
+                node[char] for char in sorted(node, reverse=True) if char != "$"
+            )
+
+        return results
+
+    def fuzzy(self, query: str, limit: int = 5, max_distance: int = 2) -> list[str]:
+        """Names within max_distance edits of query, closest first.
+        Candidates come from the trigram index: each edit can destroy at most three
+        of the query's trigrams, so names sharing fewer than that are never compared.
+        """
+
+        query = query.strip().lower()
+        query_grams = trigrams(query)
+        min_shared = max(1, len(query_grams) - 3 * max_distance)
+
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self.grams.get(gram, ()))
+
+        scored = []
+        for id, n in shared.items():
+            if n < min_shared:
+                continue
+            name = self.names[id]
+            if (distance := edit_distance(query, name, max_distance)) <= max_distance:
+                scored.append((distance, -n, name))
+
+        return [name for _, _, name in sorted(scored)[:limit]]
+
+    def suggest(self, query: str, limit: int = 5) -> list[str]:
+        """Fuzzy matches, topped up with prefix completions for partial names"""
+
+        query = query.strip().lower()
+        suggestions = self.fuzzy(query, limit)
+        for name in self.complete(query, limit):
+            if len(suggestions) >= limit:
+                break
+            if name not in suggestions:
+                suggestions.append(name)
+
+        return suggestions
+
+
+def load_name_index(card_names: Iterable[str], filename: str = gc_file) -> NameIndex:
+    """Build a name index over the given card names plus the Game Changers list"""
+
+    index = NameIndex(card_names)
+    try:
+        with open(filename, "r") as f:
+            for line in f:
+                index.add(line)
+    except FileNotFoundError:
+        pass
+
+    return index
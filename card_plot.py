@@ -1,30 +1,43 @@
+import argparse
 import json
-from typing import Union
+import os
+from typing import TYPE_CHECKING, Union
 
-import matplotlib.pyplot as plt
 import numpy as np
-import requests
 
-from card_search import get_deck_dict, load_deck_names
+from card_cache import CardCache
+from card_search import decks_dir, get_deck_dict, load_deck_names
+from deck_matrix import DeckMatrix
+from scryfall_bulk import load_bulk_index
+
+# matplotlib and the ScryFall client are imported by the functions that draw or
+# query, so data-only use never loads a plotting backend or aiohttp
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
 
 # Global variables
 frame_file = "card_frames.json"
-
-plt.ion()
+frame_codes = "WUBRGZCL"
+cmap = {
+    "W": "snow",
+    "U": "blue",
+    "B": "black",
+    "R": "red",
+    "G": "green",
+    "Z": "gold",
+    "C": "silver",
+    "L": "peru",
+}
+face_colors = np.array([cmap[frame] for frame in frame_codes])
+edge_colors = np.where(face_colors == "snow", "black", face_colors)
+render_figure = None  # reused by every render in a batch worker process
 
 
 def get_card_dict(deck_names: Union[str, list[str]]) -> dict[str, int]:
     """Combine deck lists and extract number of copies of each card"""
 
-    deck_dict = get_deck_dict(deck_names)
-
-    card_dict = {}
-    for deck in deck_dict:
-        for card in deck_dict[deck]:
-            if card in card_dict:
-                card_dict[card] += 1
-            else:
-                card_dict[card] = 1
+    matrix = DeckMatrix(get_deck_dict(deck_names))
+    card_dict = dict(zip(matrix.cards, matrix.card_frequency().astype(int).tolist()))
 
     print(
         f"    Deck list(s) contained {sum(card_dict.values())} total cards",
@@ -33,8 +46,46 @@ def get_card_dict(deck_names: Union[str, list[str]]) -> dict[str, int]:
     return card_dict
 
 
-def get_frame_dict(card_dict: dict) -> dict[str, dict[str, int]]:
-    """Given a dict with card names as keys, get their frames from ScryFall"""
+def card_fields(card: dict) -> tuple[str, list[str]]:
+    """The type line and colors that decide a card's frame"""
+
+    type_line = card.get("type_line")
+    colors = card.get("colors")
+
+    # Combine cards with multiple faces (DFCs, split cards, adventures, etc)
+    if "card_faces" in card:
+        type_line = card["card_faces"][0]["type_line"]
+        if colors is None:
+            colors = []
+            for face in card["card_faces"]:
+                colors += face["colors"]
+
+    return type_line, colors
+
+
+def classify_frames(cards: list[dict]) -> np.ndarray:
+    """Classify many cards' ScryFall metadata at once into indices into frame_codes"""
+
+    fields = [card_fields(card) for card in cards]
+    is_land = np.fromiter(("Land" in type_line for type_line, _ in fields), bool)
+    n_colors = np.fromiter((len(colors) for _, colors in fields), np.int64)
+    first_color = np.fromiter(
+        (frame_codes.index(colors[0]) if colors else 0 for _, colors in fields),
+        np.int64,
+    )
+
+    return np.select(
+        [is_land, n_colors == 0, n_colors > 1],
+        [frame_codes.index("L"), frame_codes.index("C"), frame_codes.index("Z")],
+        first_color,
+    ).astype(np.uint8)
+
+
+def get_frame_dict(card_dict: dict, bulk_file: str = None) -> dict[str, dict[str, int]]:
+    """Given a dict with card names as keys, get their frames from ScryFall.
+    Card metadata is kept in a local cache, so only cards never seen before are requested.
+    bulk_file: resolve every card from a local ScryFall bulk data file instead of the API
+    """
 
     print("    Getting frame codes from ScryFall; progress:")
 
@@ -49,36 +100,8 @@ def get_frame_dict(card_dict: dict) -> dict[str, dict[str, int]]:
         "L": {},
     }
 
-    n = 0
-    for card in card_dict:
-        if not n % 100:
-            print(f"        {n}/{len(card_dict)}")
-
-        response = requests.get(
-            "https://api.scryfall.com/cards/named?exact=" + card
-        ).json()
-
-        # Combine cards with multiple faces (DFCs, split cards, adventures, etc)
-        if "card_faces" in response:
-            response["type_line"] = response["card_faces"][0]["type_line"]
-            if "colors" not in response:
-                response["colors"] = []
-                for face in response["card_faces"]:
-                    response["colors"] += face["colors"]
-
-        if "Land" in response["type_line"]:
-            frame = "L"
-        elif len(response["colors"]) == 0:
-            frame = "C"
-        elif len(response["colors"]) > 1:
-            frame = "Z"
-        else:
-            frame = response["colors"][0]
-
-        frame_dict[frame][card] = card_dict[card]
-        n += 1
-
-    print(f"        {n}/{len(card_dict)}")
+    for card, code in get_card_frames(card_dict, bulk_file).items():
+        frame_dict[frame_codes[code]][card] = card_dict[card]
 
     with open(frame_file, "w") as f:
         json.dump(frame_dict, f)
@@ -86,13 +109,104 @@ def get_frame_dict(card_dict: dict) -> dict[str, dict[str, int]]:
     return frame_dict
 
 
+def get_card_frames(cards: list[str], bulk_file: str = None) -> dict[str, int]:
+    """Frame codes (indices into frame_codes) of the cards ScryFall knows"""
+
+    if bulk_file:
+        with load_bulk_index(bulk_file) as index:
+            metadata, not_found = index.resolve(cards)
+        if not_found:
+            print(f"    Not found in bulk data: {', '.join(not_found)}")
+
+    else:
+        metadata = get_card_metadata(cards)
+
+    return dict(zip(metadata, classify_frames(list(metadata.values())).tolist()))
+
+
+def get_card_metadata(card_dict: dict) -> dict[str, dict]:
+    """Get card metadata from the local cache, requesting missing cards from ScryFall"""
+
+    with CardCache() as cache:
+        metadata = {card: cache.get(card) for card in card_dict}
+        to_fetch = [card for card, data in metadata.items() if data is None]
+
+        print(f"        {len(card_dict) - len(to_fetch)}/{len(card_dict)} cached")
+        if to_fetch:
+            from scryfall import resolve_cards
+
+            found, not_found = resolve_cards(to_fetch)
+            metadata.update(cache.put_many(found))
+            if not_found:
+                print(f"    Not found on ScryFall: {', '.join(not_found)}")
+
+    return {card: data for card, data in metadata.items() if data is not None}
+
+
+def get_plot_data(
+    frame_dict: dict[str, dict[str, int]],
+    min_count: int = 1,
+    include_lands: bool = False,
+) -> np.ndarray:
+    """Flatten a frame dictionary into one structured array of (name, frame, count),
+    keeping cards with at least min_count copies (and lands only if asked) sorted by name
+    """
+
+    n = sum(map(len, frame_dict.values()))
+    width = max(
+        (len(card) for cards in frame_dict.values() for card in cards), default=1
+    )
+    data = np.fromiter(
+        (
+            (card, frame_codes.index(frame), count)
+            for frame, cards in frame_dict.items()
+            for card, count in cards.items()
+        ),
+        dtype=[("name", f"U{width}"), ("frame", np.uint8), ("count", np.int64)],
+        count=n,
+    )
+
+    return filter_plot_data(data, min_count, include_lands)
+
+
+def filter_plot_data(
+    data: np.ndarray, min_count: int = 1, include_lands: bool = False
+) -> np.ndarray:
+    """Keep cards with at least min_count copies (and lands only if asked), sorted by name"""
+
+    keep = data["count"] >= min_count
+    if not include_lands:
+        keep &= data["frame"] != frame_codes.index("L")
+    data = data[keep]
+
+    return data[np.argsort(data["name"])]
+
+
+def draw_bars(ax: "Axes", data: np.ndarray) -> None:
+    """Draw one bar per card, coloured by frame, on the given axes"""
+
+    x = np.arange(len(data))
+    ax.bar(
+        x,
+        data["count"],
+        color=face_colors[data["frame"]],
+        edgecolor=edge_colors[data["frame"]],
+    )
+    ax.set_xticks(x, data["name"], rotation=90)
+    ax.set_xlim(-0.5, len(x) - 0.5)
+
+
 def make_plot(
-    min_count: int = 1, include_lands: bool = False, load_from_file: bool = True
+    min_count: int = 1,
+    include_lands: bool = False,
+    load_from_file: bool = True,
+    bulk_file: str = None,
 ) -> None:
     """Plot the overall color distribution of the decks in the deck_names file.
     min_count: sets the minimum threshold for a card to be included in the plot (default: 1)
     include_lands: sets whether lands should be included in the plot (default: False)
     load_from_file: load the frame dictionary from a json file versus querying ScryFall (default: True)
+    bulk_file: when querying, use a local ScryFall bulk data file instead of the API (default: None)
     """
 
     deck_names = load_deck_names()
@@ -106,68 +220,148 @@ def make_plot(
         except (FileNotFoundError, ZeroDivisionError):
             print("    Need to query ScryFall for frames first!")
     else:
-        frame_dict = get_frame_dict(card_dict)
+        frame_dict = get_frame_dict(card_dict, bulk_file)
 
     print("    Preparing bar graph")
 
-    cmap = {
-        "W": "snow",
-        "U": "blue",
-        "B": "black",
-        "R": "red",
-        "G": "green",
-        "Z": "gold",
-        "C": "silver",
-        "L": "peru",
-    }
+    data = get_plot_data(frame_dict, min_count, include_lands)
 
-    names, colors, edges, counts = (
-        np.array([]),
-        np.array([]),
-        np.array([]),
-        np.array([]),
-    )
+    import matplotlib.pyplot as plt
 
-    for frame in cmap:
-        if (frame != "L" or include_lands) and frame_dict[frame] != {}:
-            temp = np.array(list(frame_dict[frame].items()))
-            names = np.append(names, temp.T[0])
-            colors = np.append(colors, [cmap[frame]] * len(temp))
-            edges = np.append(
-                edges, ["black" if frame == "W" else cmap[frame]] * len(temp)
-            )
-            counts = np.append(counts, temp.T[1].astype(int))
-
-    names = names[counts >= min_count]
-    colors = colors[counts >= min_count]
-    edges = edges[counts >= min_count]
-    counts = counts[counts >= min_count]
-
-    sorting = np.argsort(names)
-    names = names[sorting]
-    colors = colors[sorting]
-    edges = edges[sorting]
-    counts = counts[sorting]
-
-    x = range(len(names))
-    plt.bar(x, counts, color=colors, edgecolor=edges)
-    plt.xticks(x, names, rotation=90)
-    plt.xlim(-0.5, len(x) - 0.5)
+    draw_bars(plt.gca(), data)
     plt.tight_layout()
 
 
+def start_renderer() -> None:
+    """Put a batch worker process on the non-interactive Agg backend"""
+
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+def render_plot(path: str, data: np.ndarray) -> str:
+    """Render one bar graph to an image file, reusing this process's figure"""
+
+    import matplotlib.pyplot as plt
+
+    global render_figure
+    if render_figure is None:
+        render_figure = plt.figure()
+
+    render_figure.clf()
+    render_figure.set_size_inches(max(6.4, 0.12 * len(data)), 6.4)
+    draw_bars(render_figure.add_subplot(), data)
+    render_figure.tight_layout()
+    render_figure.savefig(path)
+
+    return path
+
+
+def render_plots(
+    groups: dict[str, list[str]],
+    output_dir: str = "plots",
+    format: str = "png",
+    min_count: int = 1,
+    include_lands: bool = False,
+    bulk_file: str = None,
+    workers: int = None,
+    deck_dir: str = decks_dir,
+) -> list[str]:
+    """Render the color distribution of each group of decks to output_dir/<group>.<format>
+    without a display. Deck lists and card frames are loaded once for all groups,
+    and the images are drawn in parallel by a process pool.
+    groups: maps each plot name to the deck names it covers
+    deck_dir: directory of the parsed deck lists (default: deck_lists)
+    """
+
+    if not os.path.exists(output_dir):
+        os.mkdir(output_dir)
+
+    deck_names = list(
+        dict.fromkeys(deck for decks in groups.values() for deck in decks)
+    )
+    matrix = DeckMatrix(get_deck_dict(deck_names, deck_dir))
+    frames = get_card_frames(matrix.cards, bulk_file)
+
+    # One row per known card; each group only fills in its own counts
+    known = np.array([card in frames for card in matrix.cards], dtype=bool)
+    template = np.zeros(
+        int(known.sum()),
+        dtype=[
+            ("name", f"U{max(map(len, matrix.cards), default=1)}"),
+            ("frame", np.uint8),
+            ("count", np.int64),
+        ],
+    )
+    template["name"] = np.array(matrix.cards, dtype=object)[known]
+    template["frame"] = [frames[card] for card in template["name"]]
+
+    jobs = []
+    for group, decks in groups.items():
+        data = template.copy()
+        data["count"] = matrix.card_frequency(decks)[known]
+        path = os.path.join(output_dir, f"{group}.{format}")
+        jobs.append((path, filter_plot_data(data, min_count, include_lands)))
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    print(f"    Rendering {len(jobs)} plots to {output_dir}")
+    with ProcessPoolExecutor(max_workers=workers, initializer=start_renderer) as pool:
+        paths = list(pool.map(render_plot, *zip(*jobs))) if jobs else []
+
+    return paths
+
+
 if __name__ == "__main__":
-    min_count = input("Enter minimum card count (default: 1): ")
-    include_lands = input("Include lands? (y)es/(N)o: ")
-    load_from_file = input("Load frames from file? (Y)es/(n)o: ")
-    try:
-        make_plot(
-            int(min_count or 1),
-            include_lands.upper() == "Y",
-            load_from_file.upper() != "N",
-        )
-    except FileNotFoundError:
-        print("Need to download deck lists first!")
-    while True:
-        input("Press enter to tighten plot")
-        plt.tight_layout()
+    parser = argparse.ArgumentParser(
+        description="Plot the color distribution of the decks in the deck_names file."
+        " With --groups, render one image per group of decks without a display."
+    )
+    parser.add_argument("--groups", help="JSON file mapping plot names to deck names")
+    parser.add_argument("--output", default="plots", help="directory for the images")
+    parser.add_argument("--format", default="png", choices=("png", "svg", "pdf"))
+    parser.add_argument("--min-count", type=int, default=1)
+    parser.add_argument("--include-lands", action="store_true")
+    parser.add_argument("--bulk-file", help="local ScryFall bulk data file")
+    parser.add_argument("--workers", type=int, help="number of render processes")
+    args = parser.parse_args()
+
+    if args.groups:
+        with open(args.groups, "r") as f:
+            groups = json.load(f)
+        for path in render_plots(
+            groups,
+            args.output,
+            args.format,
+            args.min_count,
+            args.include_lands,
+            args.bulk_file,
+            args.workers,
+        ):
+            print(f"    Wrote {path}")
+
+    else:
+        import matplotlib.pyplot as plt
+
+        plt.ion()
+
+        min_count = input("Enter minimum card count (default: 1): ")
+        include_lands = input("Include lands? (y)es/(N)o: ")
+        load_from_file = input("Load frames from file? (Y)es/(n)o: ")
+        if load_from_file.upper() == "N":
+            bulk_file = input("ScryFall bulk data file (leave blank to use the API): ")
+        else:
+            bulk_file = ""
+        try:
+            make_plot(
+                int(min_count or 1),
+                include_lands.upper() == "Y",
+                load_from_file.upper() != "N",
+                bulk_file.strip() or None,
+            )
+        except FileNotFoundError:
+            print("Need to download deck lists first!")
+        while True:
+            input("Press enter to tighten plot")
+            plt.tight_layout()
@@ -1,16 +1,34 @@
+import argparse
+import errno
+import fileinput
+import json
 import os
-import re
 import string
-import time
-from typing import Union
+import sys
+from contextlib import redirect_stdout
+from html import unescape
+from typing import TYPE_CHECKING, Union
 
-import requests
-from bs4 import BeautifulSoup
+from card_names import load_name_index
+from deck_corpus import DeckCorpus, corpus_file, split_copies
+from deck_manifest import DeckManifest
+
+# requests, numpy and multiprocessing are imported by the functions that need them,
+# so the menu and the search path start without loading them
+if TYPE_CHECKING:
+    import requests
+
+    from card_names import NameIndex
+    from deck_compliance import ComplianceReport
 
 # Global variables
 decks_dir = "deck_lists"
 decks_file = "deck_urls.txt"
+game_changers_file = "gamechangers.txt"
 tappedout = "https://tappedout.net/"
+download_workers = 4
+download_rate = 0.25  # requests per second shared by all workers, as the old 4 s sleep
+parse_workers = os.cpu_count() or 1
 
 
 def get_query() -> str:
@@ -20,12 +38,15 @@ def get_query() -> str:
     print("    (E)nter TappedOut deck urls")
     print("    (D)ownload deck lists")
     print("    (P)arse deck lists")
+    print("    (R)efresh deck lists (download and parse together)")
     print("    (S)earch for cards")
     print("    (G)ame Changer counts")
+    print("    (C)ards most often played alongside a card")
+    print("    (M)ost similar decks")
     print("    (Q)uit")
     print("")
 
-    options = ("E", "D", "P", "S", "G", "Q")
+    options = ("E", "D", "P", "R", "S", "G", "C", "M", "Q")
     while (query := input().upper()) not in (*options, ""):
         print(f"Please enter one of {', '.join(options)}")
 
@@ -40,11 +61,25 @@ def get_deck_names() -> None:
     while (mode := input().upper()) not in ("A", "R"):
         print("Please enter A or R")
 
-    with open(decks_file, "w" if mode == "R" else "a") as f:
-        print("Add deck names one per line")
+    print("Add deck names one per line")
+    deck_names = []
+    while s := input():
+        deck_names.append(s)
+
+    add_deck_names(deck_names, replace=mode == "R")
+
+
+def add_deck_names(
+    deck_names: list[str], replace: bool = False, filename: str = decks_file
+) -> list[str]:
+    """Replace or append to the list of decks; returns the full list"""
 
-        while s := input():
-            f.write(s.strip() + "\n")
+    with open(filename, "w" if replace else "a") as f:
+        for deck in deck_names:
+            if deck.strip():
+                f.write(deck.strip() + "\n")
+
+    return load_deck_names(filename)
 
 
 def load_deck_names(filename: str = decks_file) -> list[str]:
@@ -59,46 +94,190 @@ def load_deck_names(filename: str = decks_file) -> list[str]:
     return deck_names
 
 
-def get_deck_lists(output_dir: str = decks_dir) -> None:
-    """Download the deck lists from TappedOut"""
+def read_lines(files: list[str] = None) -> list[str]:
+    """Non-blank lines of the given files; no files or "-" reads stdin"""
+
+    with fileinput.input(files or ("-",), encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def get_deck_lists(
+    output_dir: str = decks_dir,
+    base_url: str = None,
+    incremental: bool = True,
+    deck_names: list[str] = None,
+) -> dict[str, int]:
+    """Download the deck lists from TappedOut
+    incremental: send conditional requests and only rewrite pages that changed (default: True)
+    Returns the download counts.
+    """
 
     if not os.path.exists(output_dir):
         os.mkdir(output_dir)
 
-    deck_names = load_deck_names()
+    from deck_downloader import DeckDownloader
+
+    if deck_names is None:
+        deck_names = load_deck_names()
+    manifest = DeckManifest(output_dir)
+
+    def save_deck(deck: str, response: "requests.Response") -> None:
+        if manifest.record_download(deck, response) or not incremental:
+            with open(manifest.html_path(deck), "w", encoding="utf-8") as f:
+                f.write(response.text)
+
+    downloader = DeckDownloader(
+        base_url or tappedout + "mtg-decks/",
+        workers=download_workers,
+        rate=download_rate,
+    )
+    try:
+        stats = downloader.download(
+            deck_names,
+            save_deck,
+            manifest.conditional_headers if incremental else None,
+        )
+    finally:
+        manifest.save()
 
-    for deck in deck_names:
-        print("    Getting deck list for", deck)
-        output = os.path.join(output_dir, deck + ".html")
-        html = get_html_from_url(tappedout + "mtg-decks/" + deck)
-        with open(output, "w", encoding="utf-8") as f:
-            f.write(html)
-        time.sleep(4)
+    print("")
+    return stats
+
+
+def parse_deck_lists(
+    output_dir: str = decks_dir,
+    incremental: bool = True,
+    deck_names: list[str] = None,
+) -> dict[str, object]:
+    """Parse the deck lists from TappedOut, spreading the decks over a process pool
+    incremental: skip decks whose page hasn't changed since the last parse (default: True)
+    Returns the number of decks parsed and skipped, and the names of those that failed.
+    """
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    if deck_names is None:
+        deck_names = load_deck_names()
+    if not os.path.isdir(output_dir):
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), output_dir)
+    manifest = DeckManifest(output_dir)
+    corpus = DeckCorpus(os.path.join(output_dir, corpus_file))
+
+    if incremental:
+        to_parse = [
+            deck
+            for deck in deck_names
+            if manifest.needs_parse(deck) or deck not in corpus
+        ]
+    else:
+        # Pages the pipeline parsed without saving are already up to date
+        to_parse = [
+            deck
+            for deck in deck_names
+            if os.path.exists(manifest.html_path(deck))
+            or not (manifest.is_parsed(deck) and deck in corpus)
+        ]
+
+    parsed, failed = {}, []
+    try:
+        with ProcessPoolExecutor(max_workers=parse_workers) as pool:
+            chunksize = max(1, len(to_parse) // (parse_workers * 4))
+            deck_lists = pool.map(
+                parse_deck_file,
+                [manifest.html_path(deck) for deck in to_parse],
+                [manifest.txt_path(deck) for deck in to_parse],
+                chunksize=chunksize,
+            )
+            for deck, deck_list in zip(to_parse, deck_lists):
+                if deck_list:
+                    print(f"    Parsed deck list for {deck} ({len(deck_list)} cards)")
+                    parsed[deck] = deck_list
+                    manifest.record_parse(deck)
+                else:
+                    failed.append(deck)
+    finally:
+        corpus.update(parsed)
+        corpus.close()
+        manifest.save()
+
+    if skipped := len(deck_names) - len(to_parse):
+        print(f"    Skipped {skipped} unchanged deck lists")
+    if failed:
+        print(f"    Failed to parse {len(failed)} deck lists: {', '.join(failed)}")
 
     print("")
+    return {
+        "parsed": len(parsed),
+        "skipped": len(deck_names) - len(to_parse),
+        "failed": failed,
+    }
+
+
+def run_pipeline(
+    output_dir: str = decks_dir,
+    base_url: str = None,
+    incremental: bool = True,
+    keep_html: bool = False,
+    deck_names: list[str] = None,
+) -> dict[str, object]:
+    """Download, parse and store the deck lists as overlapping stages, so network
+    waits and parsing run at the same time. The HTML is only written to disk if
+    keep_html is set.
+    incremental: send conditional requests and skip decks already parsed from the same page (default: True)
+    Returns the download counts, the parse results and the time spent in each stage.
+    """
+
+    from deck_pipeline import DeckPipeline
+
+    if deck_names is None:
+        deck_names = load_deck_names()
+
+    return DeckPipeline(output_dir, base_url, incremental, keep_html).run(deck_names)
+
+
+def parse_deck_file(input: str, output: str) -> list[str]:
+    """Parse one saved deck page and atomically write its card list.
+    Returns the cards as written, which is empty (and nothing is written) if the
+    page couldn't be read or parsed.
+    """
+
+    try:
+        html = get_html_from_file(input)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"    Error: Failed to read {input} ({e})")
+        return []
 
+    deck_list = [strip_single(card) for card in parse_deck_list(html)]
+    if deck_list:
+        write_deck_list(output, deck_list)
 
-def parse_deck_lists(output_dir: str = decks_dir) -> None:
-    """Parse the deck lists from TappedOut"""
+    return deck_list
 
-    deck_names = load_deck_names()
 
-    for deck in deck_names:
-        print("    Parsing deck list for", deck)
-        input = os.path.join(output_dir, deck + ".html")
-        output = os.path.join(output_dir, deck + ".txt")
-        html = get_html_from_file(input)
-        deck_list = parse_deck_list(html)
-        with open(output, "w", encoding="utf-8") as f:
-            for card in deck_list:
-                f.write(card.strip("1 ") + "\n")
+def strip_single(card: str) -> str:
+    """Drop the count of a single copy ("1 Sol Ring" -> "Sol Ring"), keeping larger
+    counts such as "10 Island" for the corpus to read as copies
+    """
+
+    card = card.strip()
+    return card[2:].strip() if card.startswith("1 ") else card
 
-    print("")
+
+def write_deck_list(output: str, deck_list: list[str]) -> None:
+    """Write a card list one card per line, replacing the file atomically"""
+
+    temp = output + ".tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        for card in deck_list:
+            f.write(card + "\n")
+    os.replace(temp, output)
 
 
 def get_html_from_url(url: str) -> str:
     """Given a TappedOut deck name, download the HTML from the web"""
 
+    import requests
+
     response = requests.get(url)
     return response.text
 
@@ -114,80 +293,249 @@ def get_html_from_file(filepath: str) -> str:
 def parse_deck_list(html: str) -> list[str]:
     """Given an HTML string, parse the deck list"""
 
-    start = r'<input type="hidden" name="c" value="'
-    end = r'">'
+    start = '<input type="hidden" name="c" value="'
+    end = '">'
 
-    if match := re.search(f"{start}(.*?){end}", html):
-        raw_string = match.group(1)
-        return BeautifulSoup(raw_string, features="html.parser").get_text().split("||")
+    a = html.find(start)
+    b = html.find(end, a + len(start)) if a >= 0 else -1
+
+    if b >= 0:
+        return unescape(html[a + len(start) : b]).split("||")
     else:
         print("    Error: Failed to parse deck list")
         return []
 
 
-def get_deck_dict(deck_names: Union[str, list[str]]) -> dict[str, list[str]]:
-    """Extract deck lists from list of deck names and return them as a dictionary"""
+def get_deck_dict(
+    deck_names: Union[str, list[str]], output_dir: str = decks_dir
+) -> dict[str, list[str]]:
+    """Extract deck lists from list of deck names and return them as a dictionary.
+    Decks are bulk loaded from the corpus database, falling back to the .txt
+    files for any deck that was parsed before the corpus existed.
+    """
 
     if type(deck_names) == str:
         deck_names = [deck_names]
 
+    corpus_path = os.path.join(output_dir, corpus_file)
+    if os.path.exists(corpus_path):
+        with DeckCorpus(corpus_path) as corpus:
+            loaded = corpus.load_all(deck_names)
+    else:
+        loaded = {}
+
     deck_dict = {}
     for deck in deck_names:
-        with open(os.path.join(decks_dir, deck + ".txt"), "r") as f:
+        if deck in loaded:
+            deck_dict[deck] = loaded[deck]
+            continue
+
+        with open(os.path.join(output_dir, deck + ".txt"), "r") as f:
             deck_list = f.read().strip().lower().split("\n")
             deck_dict[deck] = deck_list
 
     return deck_dict
 
 
+def get_corpus(deck_names: list[str], output_dir: str = decks_dir) -> DeckCorpus:
+    """Open the corpus database, importing any listed deck missing from it from its .txt file.
+    Raises FileNotFoundError if the deck lists haven't been parsed into a corpus yet.
+    """
+
+    corpus_path = os.path.join(output_dir, corpus_file)
+    if not os.path.exists(corpus_path):
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), corpus_path)
+
+    corpus = DeckCorpus(corpus_path)
+    missing = [deck for deck in deck_names if deck not in corpus]
+    if missing:
+        try:
+            corpus.update(get_deck_dict(missing, output_dir))
+        except FileNotFoundError:
+            corpus.close()
+            raise
+
+    return corpus
+
+
 def search_for_cards() -> None:
-    """Search deck lists for all instances of user supplied card name"""
+    """Search deck lists for all instances of user supplied card name.
+    Several names can be combined with && (decks with all of them) or || (decks with any),
+    and a name ending in * lists the card names starting with it.
+    """
 
     deck_names = load_deck_names()
-    deck_dict = get_deck_dict(deck_names)
+
+    with get_corpus(deck_names) as corpus:
+        name_index = None
+
+        print("Enter full card name (combine names with && or ||):")
+        while card := input():
+            if name_index is None:
+                name_index = load_name_index(corpus.cards())
+
+            if card.endswith("*"):
+                completions = name_index.complete(card[:-1].strip(), limit=20)
+                print(f"\nCard names starting with {card[:-1].strip()!r}:")
+                print([string.capwords(name) for name in completions])
+                print("\nEnter another full card name, or leave blank to exit:")
+                continue
+
+            hits, suggestions = find_decks(corpus, name_index, card, deck_names)
+
+            if len(hits):
+                print(f"\n{string.capwords(card)} was found in the following decks:")
+                print(hits)
+            else:
+                print(f"\n{string.capwords(card)} was not found in any decks")
+                for names in suggestions.values():
+                    print(
+                        f"    Did you mean: {', '.join(map(string.capwords, names))}?"
+                    )
+
+            print("\nEnter another full card name, or leave blank to exit:")
+
+
+def find_decks(
+    corpus: DeckCorpus, name_index: "NameIndex", query: str, deck_names: list[str]
+) -> tuple[list[str], dict[str, list[str]]]:
+    """Decks matching a query of card names joined by && or ||, in deck list order.
+    If there are none, also returns suggested names for each unknown card name.
+    """
+
+    if "||" in query:
+        terms = query.split("||")
+        matches = corpus.search(terms, match_all=False)
+    else:
+        terms = query.split("&&")
+        matches = corpus.search(terms)
+    hits = [deck for deck in deck_names if deck in matches]
+
+    suggestions = {}
+    if not hits:
+        for term in terms:
+            if term.strip().lower() not in name_index:
+                if names := name_index.suggest(term):
+                    suggestions[term.strip()] = names
+
+    return hits, suggestions
+
+
+def search_cards(
+    queries: list[str], deck_names: list[str], output_dir: str = decks_dir
+) -> list[dict]:
+    """Run several search queries; a query ending in * lists card names starting with it"""
+
+    results = []
+    with get_corpus(deck_names, output_dir) as corpus:
+        name_index = load_name_index(corpus.cards())
+        for query in queries:
+            if query.endswith("*"):
+                prefix = query[:-1].strip()
+                results.append(
+                    {"query": query, "completions": name_index.complete(prefix)}
+                )
+                continue
+
+            hits, suggestions = find_decks(corpus, name_index, query, deck_names)
+            results.append({"query": query, "decks": hits, "suggestions": suggestions})
+
+    return results
+
+
+def check_compliance(
+    deck_names: list[str],
+    watch_lists: dict[str, str] = None,
+    output_dir: str = decks_dir,
+) -> "ComplianceReport":
+    """Check the deck lists against watch list files (default: the Game Changers)
+    watch_lists: maps each watch list name to its file
+    """
+
+    from deck_compliance import load_engine, watch_list_files
+    from deck_matrix import DeckMatrix
+
+    engine = load_engine(watch_lists or watch_list_files)
+    return engine.check(DeckMatrix(get_deck_dict(deck_names, output_dir)))
+
+
+def game_changers() -> None:
+    """Count the number of Game Changers in each deck list.
+    One watch list only needs a set lookup per card, so unlike check_compliance
+    this doesn't load numpy.
+    """
+
+    with open(game_changers_file, "r", encoding="utf-8") as f:
+        gc_names = {line.strip().lower(): line.strip() for line in f if line.strip()}
+
+    print("Number of Game Changers in each deck:")
+    for name, deck_list in get_deck_dict(load_deck_names()).items():
+        names = dict.fromkeys(split_copies(line)[0] for line in deck_list)
+        cards = [gc_names[card] for card in names if card in gc_names]
+        if cards:
+            print(f"    {name}: {len(cards)} ({', '.join(cards)})")
+        else:
+            print(f"    {name}: 0")
+
+    print("")
+
+
+def card_partners() -> None:
+    """List the cards most often played alongside a user supplied card"""
+
+    from card_synergy import SynergyEngine
+    from deck_matrix import DeckMatrix
+
+    deck_names = load_deck_names()
+    engine = SynergyEngine(DeckMatrix(get_deck_dict(deck_names)))
 
     print("Enter full card name:")
     while card := input():
-        hits = []
-        for deck in deck_dict:
-            if card.lower() in deck_dict[deck]:
-                hits.append(deck)
-
-        if len(hits):
-            print(f"\n{string.capwords(card)} was found in the following decks:")
-            print(hits)
+        partners = engine.top_partners(card)
+
+        if len(partners):
+            print(f"\nCards most often played with {string.capwords(card)}:")
+            for name, together, lift in partners:
+                print(
+                    f"    {string.capwords(name)}: {together} decks (lift {lift:.2f})"
+                )
         else:
-            print(f"\n{string.capwords(card)} was not found in any decks")
+            print(f"\n{string.capwords(card)} was not found in enough decks")
 
         print("\nEnter another full card name, or leave blank to exit:")
 
 
-def game_changers() -> None:
-    """Count the number of Game Changers in each deck list"""
+def similar_decks(threshold: float = 0.8) -> None:
+    """List near-duplicate decks, then the decks most similar to user supplied ones"""
 
-    gc_file = "gamechangers.txt"
-    with open(gc_file, "r") as f:
-        lines = f.readlines()
-
-    gc_set = set()
-    for line in lines:
-        gc_set.add(line.strip().lower())
+    from deck_matrix import DeckMatrix
+    from deck_similarity import DeckSimilarity
 
     deck_names = load_deck_names()
-    deck_dict = get_deck_dict(deck_names)
-
-    gc_counts = {}
-    for name, decklist in deck_dict.items():
-        gc_counts[name] = len(gc_set.intersection(decklist))
+    similarity = DeckSimilarity(DeckMatrix(get_deck_dict(deck_names)))
+
+    pairs = similarity.pairs(threshold)
+    print(f"Pairs of decks sharing at least {threshold:.0%} of their cards:")
+    for deck_a, deck_b, score in pairs:
+        print(f"    {deck_a} / {deck_b}: {score:.2f}")
+    if not pairs:
+        print("    None")
+
+    print("\nEnter deck name:")
+    while deck := input().strip():
+        if deck in similarity.row_of:
+            print(f"\nDecks most similar to {deck}:")
+            for other, score in similarity.similar(deck):
+                print(f"    {other}: {score:.2f}")
+        else:
+            print(f"\n{deck} is not in the list of decks")
 
-    print("Number of Game Changers in each deck:")
-    for name, gc_count in gc_counts.items():
-        print(f"    {name}: {gc_count}")
+        print("\nEnter another deck name, or leave blank to exit:")
 
-    print("")
 
+def menu() -> None:
+    """Run the interactive menu until the user quits"""
 
-if __name__ == "__main__":
     while (query := get_query()) not in ("Q", ""):
         if query == "E":
             get_deck_names()
@@ -201,6 +549,11 @@ if __name__ == "__main__":
                 parse_deck_lists()
             except FileNotFoundError:
                 print("    Need to download deck lists first!")
+        elif query == "R":
+            try:
+                run_pipeline()
+            except FileNotFoundError:
+                print("    Need to enter deck names first!")
         elif query == "S":
             try:
                 search_for_cards()
@@ -211,3 +564,172 @@ if __name__ == "__main__":
                 game_changers()
             except FileNotFoundError:
                 print("    Need to parse deck lists first!")
+        elif query == "C":
+            try:
+                card_partners()
+            except FileNotFoundError:
+                print("    Need to parse deck lists first!")
+        elif query == "M":
+            try:
+                similar_decks()
+            except FileNotFoundError:
+                print("    Need to parse deck lists first!")
+
+
+def main(argv: list[str] = None) -> None:
+    """Run one step of the pipeline without prompts and print its result as JSON.
+    Progress messages go to stderr so stdout stays machine-readable.
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Download, parse and search TappedOut deck lists."
+        " Run without arguments for the interactive menu."
+    )
+    parser.add_argument(
+        "--decks",
+        default=decks_file,
+        help=f"file of deck names, or - for stdin (default: {decks_file})",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=decks_dir,
+        help=f"directory of the deck pages and lists (default: {decks_dir})",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add = subparsers.add_parser(
+        "add-decks", help="add deck names from files or stdin to the list of decks"
+    )
+    add.add_argument("files", nargs="*", help="files of deck names (default: stdin)")
+    add.add_argument("--replace", action="store_true", help="replace the list")
+
+    for name, help in (
+        ("download", "download the deck pages"),
+        ("parse", "parse the downloaded deck pages"),
+        ("pipeline", "download and parse in one pass"),
+    ):
+        command = subparsers.add_parser(name, help=help)
+        command.add_argument(
+            "--full", action="store_true", help="redo every deck, not only changes"
+        )
+        if name != "parse":
+            command.add_argument("--base-url", help="deck page root URL")
+        if name == "pipeline":
+            command.add_argument(
+                "--keep-html", action="store_true", help="also save the deck pages"
+            )
+
+    search = subparsers.add_parser(
+        "search", help="find the decks containing cards (queries as in the menu)"
+    )
+    search.add_argument(
+        "queries", nargs="*", help="queries (default: one per stdin line)"
+    )
+
+    gc = subparsers.add_parser("game-changers", help="count Game Changers per deck")
+    gc.add_argument(
+        "--list",
+        default=game_changers_file,
+        help=f"file of card names (default: {game_changers_file})",
+    )
+
+    compliance = subparsers.add_parser(
+        "compliance", help="check the decks against several watch lists at once"
+    )
+    compliance.add_argument(
+        "--list",
+        action="append",
+        metavar="NAME=FILE",
+        help="watch list of card names; repeat for more (default: the Game Changers)",
+    )
+    compliance.add_argument("--csv", help="also write the report as CSV")
+    compliance.add_argument("--json", help="also write the report as JSON")
+
+    plot = subparsers.add_parser(
+        "plot", help="render color distribution plots without a display"
+    )
+    plot.add_argument(
+        "--groups",
+        help="JSON file mapping plot names to deck names (default: all decks)",
+    )
+    plot.add_argument("--output", default="plots", help="directory for the images")
+    plot.add_argument("--format", default="png", choices=("png", "svg", "pdf"))
+    plot.add_argument("--min-count", type=int, default=1)
+    plot.add_argument("--include-lands", action="store_true")
+    plot.add_argument("--bulk-file", help="local ScryFall bulk data file")
+
+    args = parser.parse_args(argv)
+
+    try:
+        with redirect_stdout(sys.stderr):
+            if args.command == "add-decks":
+                deck_names = add_deck_names(read_lines(args.files), args.replace)
+                result = {"decks": len(deck_names)}
+            else:
+                deck_names = read_lines([args.decks])
+
+            if args.command == "download":
+                result = get_deck_lists(
+                    args.output_dir, args.base_url, not args.full, deck_names
+                )
+            elif args.command == "parse":
+                result = parse_deck_lists(args.output_dir, not args.full, deck_names)
+            elif args.command == "pipeline":
+                result = run_pipeline(
+                    args.output_dir,
+                    args.base_url,
+                    not args.full,
+                    args.keep_html,
+                    deck_names,
+                )
+            elif args.command == "search":
+                result = search_cards(
+                    args.queries or read_lines(), deck_names, args.output_dir
+                )
+            elif args.command == "game-changers":
+                result = check_compliance(
+                    deck_names, {"game_changers": args.list}, args.output_dir
+                ).count("game_changers")
+            elif args.command == "compliance":
+                watch_lists = None
+                if args.list:
+                    watch_lists = dict(
+                        item.split("=", 1) if "=" in item else (item, item)
+                        for item in args.list
+                    )
+                report = check_compliance(deck_names, watch_lists, args.output_dir)
+                if args.csv:
+                    report.to_csv(args.csv)
+                if args.json:
+                    report.to_json(args.json)
+                result = report.to_dict()
+            elif args.command == "plot":
+                from card_plot import render_plots
+
+                if args.groups:
+                    with open(args.groups, "r") as f:
+                        groups = json.load(f)
+                else:
+                    groups = {"decks": deck_names}
+                paths = render_plots(
+                    groups,
+                    args.output,
+                    args.format,
+                    args.min_count,
+                    args.include_lands,
+                    args.bulk_file,
+                    deck_dir=args.output_dir,
+                )
+                result = {"plots": paths}
+    except FileNotFoundError as e:
+        sys.exit(f"Error: {e.filename} not found")
+
+    json.dump(result, sys.stdout, indent=1)
+    print("")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main()
+    else:
+        menu()
@@ -0,0 +1,118 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from deck_matrix import DeckMatrix
+
+
+class SynergyEngine:
+    """Cards most often played alongside a given card, scored by lift or PMI.
+    Co-occurrence counts are computed per query card from the rows of the decks
+    containing it rather than as a full card x card matrix, and the count vectors
+    of recently queried cards are kept in a bounded LRU cache. add_decks updates
+    the deck frequencies and cached counts from the changed decks alone.
+    """
+
+    def __init__(self, matrix: DeckMatrix, cache_size: int = 256):
+        self.matrix = matrix
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.df = matrix.deck_frequency()
+
+    def pad(self, vector: np.ndarray) -> np.ndarray:
+        """Extend a per-card vector with zeros for cards added to the vocabulary since"""
+
+        return np.pad(vector, (0, self.matrix.n_cards - len(vector)))
+
+    def counts(self, card: str) -> np.ndarray:
+        """Number of decks containing both card and each vocabulary card"""
+
+        if card in self.cache:
+            self.cache.move_to_end(card)
+            return self.cache[card]
+
+        co = self.matrix.cooccurrence(card)
+        self.cache[card] = co
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return co
+
+    def add_decks(self, deck_dict: dict[str, list[str]]) -> None:
+        """Add newly parsed decks, replacing the rows of any deck already in the matrix"""
+
+        matrix = self.matrix
+        # Cards outside the vocabulary have cached all-zero counts the new decks may change
+        for card in [card for card in self.cache if card not in matrix.vocab]:
+            del self.cache[card]
+
+        row_of = {deck: row for row, deck in enumerate(matrix.decks)}
+        reparsed = [deck for deck in deck_dict if deck in row_of]
+        self.count_rows(
+            np.array([row_of[deck] for deck in reparsed], dtype=np.int64), -1
+        )
+        matrix.remove(reparsed)
+
+        start = matrix.n_decks
+        matrix.extend(deck_dict)
+        self.df = self.pad(self.df)
+        for card in self.cache:
+            self.cache[card] = self.pad(self.cache[card])
+        self.count_rows(np.arange(start, matrix.n_decks), 1)
+
+    def count_rows(self, rows: np.ndarray, sign: int) -> None:
+        """Add (sign 1) or subtract (sign -1) the given matrix rows from the deck
+        frequencies and from the cached counts of the cards they contain
+        """
+
+        matrix = self.matrix
+        ids = matrix.indices[matrix.row_entries(rows)]
+        row_of_entry = np.repeat(
+            np.arange(len(rows)), matrix.indptr[rows + 1] - matrix.indptr[rows]
+        )
+
+        self.df = self.df + sign * np.bincount(ids, minlength=matrix.n_cards)
+        for card, co in self.cache.items():
+            with_card = np.zeros(len(rows), dtype=bool)
+            with_card[row_of_entry[ids == matrix.vocab[card]]] = True
+            together = ids[with_card[row_of_entry]]
+            self.cache[card] = co + sign * np.bincount(together, minlength=len(co))
+
+    def top_partners(
+        self, card: str, k: int = 10, score: str = "lift", min_count: int = 2
+    ) -> list[tuple[str, int, float]]:
+        """Return up to k (card, decks together, score) tuples, best first.
+        score: "lift" (observed / expected co-occurrence), "pmi" (log2 of lift) or "count"
+        min_count: ignore partners seen together in fewer decks than this (default: 2)
+        """
+
+        card = card.strip().lower()
+        if card not in self.matrix.vocab:
+            return []
+
+        id = self.matrix.vocab[card]
+        co = self.counts(card)
+        candidates = np.flatnonzero(co >= min_count)
+        candidates = candidates[candidates != id]
+        if not len(candidates):
+            return []
+
+        together = co[candidates]
+        if score == "count":
+            scores = together.astype(float)
+        else:
+            expected = self.df[id] * self.df[candidates] / self.matrix.n_decks
+            scores = together / expected
+            if score == "pmi":
+                scores = np.log2(scores)
+
+        if len(candidates) > k:
+            best = np.argpartition(-scores, k)[:k]
+        else:
+            best = np.arange(len(candidates))
+        best = best[np.lexsort((-together[best], -scores[best]))]
+
+        return [
+            (self.matrix.cards[candidates[i]], int(together[i]), float(scores[i]))
+            for i in best
+        ]
@@ -1,20 +1,21 @@
-'''Plots a histogram of the frequency of cards in a supplied text file, e.g. a deck list. Second and third arguments are optional and control the minimum frequency to appear in the plot (default 1) and whether or not to include lands (default False).'''
+'''Plots a histogram of the frequency of cards in a supplied text file, e.g. a deck list. Second and third arguments are optional and control the minimum frequency to appear in the plot (default 1) and whether or not to include lands (default False). An optional fourth argument is a local ScryFall bulk data file to take card frames from instead of the API, and an optional fifth argument saves the plot to that image file without opening a window.'''
 
 import numpy as np
-import requests, sys
+import sys
 import matplotlib.pyplot as plt
-plt.ion()
+from scryfall import resolve_cards
+from scryfall_bulk import load_bulk_index
 
 def read_cards(filename):
 	
-	print 'Getting card list from', filename
+	print('Getting card list from', filename)
 
 	with open(filename, 'r') as f:
 		lines = f.readlines()
 
 	counts, cards = [], []
 	for line in lines:
-		if line.strip() is not '':
+		if line.strip() != '':
 			counts.append(int(line.split('x', 1)[0]))
 			cards.append(line.split('x', 1)[1].split('(')[0].split('*')[0].split('/')[0].strip())
 
@@ -28,10 +29,10 @@ def read_cards(filename):
 		else:
 			card_dict[card] = count
 	
-	print '    Card list contained %i total cards, with %i unique names' % (sum(counts), len(card_dict))
+	print('    Card list contained %i total cards, with %i unique names' % (sum(counts), len(card_dict)))
 	return card_dict
 
-def get_frames(card_dict=None, filename=None):
+def get_frames(card_dict=None, filename=None, bulk_file=None):
 	
 	if card_dict is None:
 		if filename is None:
@@ -39,44 +40,47 @@ def get_frames(card_dict=None, filename=None):
 		else:
 			card_dict = read_cards(filename)
 	
-	print 'Getting frame codes from ScryFall; progress:'
+	print('Getting frame codes from ScryFall; progress:')
 	
 	frame_dict = {'W':{}, 'U':{}, 'B':{}, 'R':{}, 'G':{}, 'Z':{}, 'C':{}, 'L':{}}
 	
-	n = 0
-	for card in card_dict:
-		if not n%100:
-			print '    %i/%i' % (n, len(card_dict))
-		
-		r = requests.get('https://api.scryfall.com/cards/named?exact=' + card)
-		if 'Land' in r.json()['type_line']:
+	if bulk_file:
+		with load_bulk_index(bulk_file) as index:
+			found, not_found = index.resolve(card_dict)
+	else:
+		found, not_found = resolve_cards(list(card_dict))
+	if not_found:
+		print('    Not found on ScryFall:', ', '.join(not_found))
+	
+	for card, r in found.items():
+		if 'Land' in r['type_line']:
 			frame = 'L'
-		elif len(r.json()['color_identity']) < 1:
+		elif len(r['color_identity']) < 1:
 			frame = 'C'
-		elif len(r.json()['color_identity']) > 1:
+		elif len(r['color_identity']) > 1:
 			frame = 'Z'
 		else:
-			frame = r.json()['color_identity'][0]
+			frame = r['color_identity'][0]
 		
 		frame_dict[frame][card] = card_dict[card]
-		n+=1
 	
-	print '    %i/%i' % (n, len(card_dict))
 	return frame_dict
 
-def make_plot(min_count=1, include_lands=False, frame_dict=None, filename=None):
+def make_plot(min_count=1, include_lands=False, frame_dict=None, filename=None, ax=None):
 	
 	if frame_dict is None:
 		frame_dict = get_frames(filename=filename)
+	if ax is None:
+		ax = plt.gca()
 	
-	print 'Preparing bar graph'
+	print('Preparing bar graph')
 	
 	cmap = {'W':'snow', 'U':'blue', 'B':'black', 'R':'red', 'G':'green', 'Z':'gold', 'C':'silver', 'L':'peru'}
 	
 	names, colors, edges, counts = np.array([]), np.array([]), np.array([]), np.array([])
 	for frame in cmap:
 		if (frame!='L' or include_lands) and frame_dict[frame]!={}: 
-			temp = np.array(frame_dict[frame].items())
+			temp = np.array(list(frame_dict[frame].items()))
 			names = np.append(names, temp.T[0])
 			colors = np.append(colors, [cmap[frame]]*len(temp))
 			edges = np.append(edges, ['black' if frame=='W' else cmap[frame]]*len(temp))
@@ -94,10 +98,10 @@ def make_plot(min_count=1, include_lands=False, frame_dict=None, filename=None):
 	counts = counts[sorting]
 	
 	x = range(len(names))
-	plt.bar(x, counts, color=colors, edgecolor=edges)
-	plt.xticks(x, names, rotation=90)
-	plt.xlim(-.5, len(x)-.5)
-	plt.tight_layout()
+	ax.bar(x, counts, color=colors, edgecolor=edges)
+	ax.set_xticks(x, names, rotation=90)
+	ax.set_xlim(-.5, len(x)-.5)
+	ax.figure.tight_layout()
 
 if __name__ == '__main__':
 
@@ -112,9 +116,19 @@ if __name__ == '__main__':
         include_lands = False
     
     card_dict = read_cards(filename)
-    frame_dict = get_frames(card_dict, filename)
+    bulk_file = sys.argv[4] if len(sys.argv)>=5 else None
+    output = sys.argv[5] if len(sys.argv)>=6 else None
+    
+    if output:
+        plt.switch_backend('Agg')
+    else:
+        plt.ion()
+    frame_dict = get_frames(card_dict, filename, bulk_file)
     make_plot(min_count=min_count, include_lands=include_lands, frame_dict=frame_dict, filename=filename)
     
-    val = None
-    while val is None:
-        val = raw_input('')
+    if output:
+        plt.savefig(output)
+    else:
+        val = None
+        while val is None:
+            val = input('')
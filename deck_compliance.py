@@ -0,0 +1,175 @@
+import csv
+import json
+import os
+from typing import Iterable
+
+import numpy as np
+
+from deck_matrix import DeckMatrix
+
+# Global variables
+watch_list_files = {"game_changers": "gamechangers.txt"}
+max_watch_lists = 64  # one bit of a uint64 per list
+compiled = {}  # watch list files already loaded, keyed by their names, paths and mtimes
+
+
+def load_watch_list(filename: str) -> list[str]:
+    """Card names in a watch list file, one per line"""
+
+    with open(filename, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def load_engine(files: dict[str, str] = watch_list_files) -> "ComplianceEngine":
+    """Compile watch list files into an engine, reusing it until a file changes
+    files: maps each watch list name to its file
+    """
+
+    key = tuple((name, path, os.stat(path).st_mtime) for name, path in files.items())
+    if key not in compiled:
+        compiled[key] = ComplianceEngine(
+            {name: load_watch_list(path) for name, path in files.items()}
+        )
+
+    return compiled[key]
+
+
+class ComplianceEngine:
+    """Checks decks against several watch lists (bans, Game Changers, custom lists) at once.
+    Every watch list card gets an integer id and a bitset of the lists naming it, so one
+    vectorized pass over a DeckMatrix gives each deck's count and offending cards for
+    every list.
+    watch_lists: maps each list name to its card names
+    """
+
+    def __init__(self, watch_lists: dict[str, Iterable[str]]):
+        if len(watch_lists) > max_watch_lists:
+            raise ValueError(f"At most {max_watch_lists} watch lists are supported")
+
+        self.lists = list(watch_lists)
+        self.card_ids = {}
+        self.display = []
+        bits = []
+        for j, cards in enumerate(watch_lists.values()):
+            for card in cards:
+                card_id = self.card_ids.setdefault(card.strip().lower(), len(bits))
+                if card_id == len(bits):
+                    self.display.append(card.strip())
+                    bits.append(0)
+                bits[card_id] |= 1 << j
+        self.card_bits = np.array(bits, dtype=np.uint64)
+
+    def vocab_bits(self, matrix: DeckMatrix) -> np.ndarray:
+        """Watch list bitset of every card in the matrix vocabulary (0 if on no list)"""
+
+        bits = np.zeros(matrix.n_cards, dtype=np.uint64)
+        for card, card_id in self.card_ids.items():
+            if (i := matrix.vocab.get(card)) is not None:
+                bits[i] = self.card_bits[card_id]
+
+        return bits
+
+    def check(self, matrix: DeckMatrix) -> "ComplianceReport":
+        """Count the distinct watch list cards of every deck and collect them by list"""
+
+        vocab_bits = self.vocab_bits(matrix)
+        entry_bits = vocab_bits[matrix.indices]
+        hits = np.flatnonzero(entry_bits)
+        rows = matrix.rows[hits]
+
+        # One column per list: whether each hit entry is on it
+        on_list = (
+            entry_bits[hits, None] >> np.arange(len(self.lists), dtype=np.uint64)
+        ) & np.uint64(1)
+        counts = np.zeros((matrix.n_decks, len(self.lists)), dtype=np.int64)
+        for j in range(len(self.lists)):
+            counts[:, j] = np.bincount(
+                rows, weights=on_list[:, j], minlength=matrix.n_decks
+            )
+
+        names = {
+            card: self.display[self.card_ids[matrix.cards[card]]]
+            for card in np.flatnonzero(vocab_bits).tolist()
+        }
+        hit_decks = [matrix.decks[row] for row in rows.tolist()]
+        hit_names = [names[card] for card in matrix.indices[hits].tolist()]
+
+        # Entries are grouped by row and sorted by vocabulary id within it, so each
+        # deck's cards come out in the order the matrix first saw them, not deck order
+        offenders = {}
+        for j, name in enumerate(self.lists):
+            for k in np.flatnonzero(on_list[:, j]).tolist():
+                if (deck := hit_decks[k]) not in offenders:
+                    offenders[deck] = {watch_list: [] for watch_list in self.lists}
+                offenders[deck][name].append(hit_names[k])
+
+        return ComplianceReport(list(matrix.decks), self.lists, counts, offenders)
+
+
+class ComplianceReport:
+    """Per-deck watch list counts and offending cards from ComplianceEngine.check.
+    counts has one row per deck and one column per watch list.
+    """
+
+    def __init__(
+        self,
+        decks: list[str],
+        lists: list[str],
+        counts: np.ndarray,
+        offenders: dict[str, dict[str, list[str]]],
+    ):
+        self.decks = decks
+        self.lists = lists
+        self.counts = counts
+        self.offenders = offenders
+
+    def count(self, watch_list: str) -> dict[str, int]:
+        """Number of cards from one watch list in each deck"""
+
+        column = self.counts[:, self.lists.index(watch_list)].tolist()
+        return dict(zip(self.decks, column))
+
+    def cards(self, deck: str, watch_list: str) -> list[str]:
+        """The cards of a deck that are on a watch list"""
+
+        return self.offenders.get(deck, {}).get(watch_list, [])
+
+    def violations(self, watch_list: str, allowed: int = 0) -> list[str]:
+        """Decks with more than the allowed number of cards from a watch list"""
+
+        return [deck for deck, n in self.count(watch_list).items() if n > allowed]
+
+    def to_dict(self) -> dict[str, dict[str, dict]]:
+        return {
+            deck: {
+                watch_list: {
+                    "count": int(self.counts[row, j]),
+                    "cards": self.cards(deck, watch_list),
+                }
+                for j, watch_list in enumerate(self.lists)
+            }
+            for row, deck in enumerate(self.decks)
+        }
+
+    def to_json(self, filename: str) -> None:
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def to_csv(self, filename: str) -> None:
+        """One row per deck with a count column and a cards column for each watch list"""
+
+        with open(filename, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            header = ["deck"]
+            for watch_list in self.lists:
+                header += [watch_list, watch_list + "_cards"]
+            writer.writerow(header)
+
+            for row, deck in enumerate(self.decks):
+                line = [deck]
+                for j, watch_list in enumerate(self.lists):
+                    line += [
+                        int(self.counts[row, j]),
+                        "; ".join(self.cards(deck, watch_list)),
+                    ]
+                writer.writerow(line)
@@ -0,0 +1,132 @@
+import sqlite3
+from collections import Counter
+from typing import Iterable
+
+# Global variables
+corpus_file = "corpus.db"
+
+
+def split_copies(line: str) -> tuple[str, int]:
+    """Split a deck list line such as "2 island" into the card name and its copies"""
+
+    count, _, card = line.partition(" ")
+    if count.isdigit() and card:
+        return card.strip(), int(count)
+
+    return line.strip(), 1
+
+
+class DeckCorpus:
+    """All parsed deck lists in a single SQLite database, one row per deck.
+    Card lists are stored lowercased and newline separated, exactly as
+    get_deck_dict returns them, so loading is one query plus a split per deck.
+    An inverted index of postings (card -> deck, copies) is kept in step with
+    the deck table so card lookups never scan the deck lists. Postings are keyed
+    by the bare card name, with the count of lines like "2 island" as the copies.
+    """
+
+    schema_version = 2
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS decks (name TEXT PRIMARY KEY, cards TEXT NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS postings (card TEXT NOT NULL, deck TEXT NOT NULL,"
+            " copies INTEGER NOT NULL, PRIMARY KEY (card, deck)) WITHOUT ROWID"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS postings_deck ON postings (deck)")
+
+        # Corpora written before the index (or its copy counts) need their postings rebuilt once
+        if self.db.execute("PRAGMA user_version").fetchone()[0] < self.schema_version:
+            self.update(self.load_all())
+            self.db.execute(f"PRAGMA user_version = {self.schema_version}")
+
+    def __enter__(self) -> "DeckCorpus":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __contains__(self, deck: str) -> bool:
+        row = self.db.execute("SELECT 1 FROM decks WHERE name = ?", (deck,))
+        return row.fetchone() is not None
+
+    def names(self) -> list[str]:
+        return [row[0] for row in self.db.execute("SELECT name FROM decks")]
+
+    def cards(self) -> list[str]:
+        """Every distinct card name in the corpus"""
+
+        return [row[0] for row in self.db.execute("SELECT DISTINCT card FROM postings")]
+
+    def update(self, deck_dict: dict[str, Iterable[str]]) -> None:
+        """Insert or replace the card lists of the given decks, and their postings,
+        in one transaction
+        """
+
+        with self.db:
+            for deck, cards in deck_dict.items():
+                text = "\n".join(cards).strip().lower()
+                self.db.execute(
+                    "INSERT OR REPLACE INTO decks (name, cards) VALUES (?, ?)",
+                    (deck, text),
+                )
+                copies = Counter()
+                for line in text.split("\n"):
+                    if line:
+                        card, n = split_copies(line)
+                        copies[card] += n
+
+                self.db.execute("DELETE FROM postings WHERE deck = ?", (deck,))
+                self.db.executemany(
+                    "INSERT INTO postings (card, deck, copies) VALUES (?, ?, ?)",
+                    ((card, deck, n) for card, n in copies.items()),
+                )
+
+    def decks_with(self, card: str) -> dict[str, int]:
+        """Return the decks containing a card, with the number of copies in each"""
+
+        rows = self.db.execute(
+            "SELECT deck, copies FROM postings WHERE card = ?",
+            (card.strip().lower(),),
+        )
+        return dict(rows)
+
+    def search(self, cards: Iterable[str], match_all: bool = True) -> set[str]:
+        """Return the decks containing all (or any) of the given cards"""
+
+        postings = [set(self.decks_with(card)) for card in cards]
+        if not postings:
+            return set()
+
+        # Intersect starting from the shortest posting list
+        if match_all:
+            postings.sort(key=len)
+            return set.intersection(*postings)
+        else:
+            return set.union(*postings)
+
+    def load(self, deck: str) -> list[str]:
+        """Load a single deck list, raising KeyError if it isn't in the corpus"""
+
+        row = self.db.execute("SELECT cards FROM decks WHERE name = ?", (deck,))
+        if (result := row.fetchone()) is None:
+            raise KeyError(deck)
+
+        return result[0].split("\n")
+
+    def load_all(self, deck_names: Iterable[str] = None) -> dict[str, list[str]]:
+        """Load every deck list (or just the named ones) in one bulk read"""
+
+        rows = self.db.execute("SELECT name, cards FROM decks")
+        if deck_names is None:
+            return {name: cards.split("\n") for name, cards in rows}
+
+        wanted = set(deck_names)
+        return {name: cards.split("\n") for name, cards in rows if name in wanted}
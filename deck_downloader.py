@@ -0,0 +1,181 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Global variables
+retry_statuses = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """Thread-safe token bucket that spreads one request budget over all workers"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available, then consume it"""
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class DeckDownloader:
+    """Download deck pages with a bounded worker pool and a shared rate limit.
+    base_url: prefix the deck names are appended to (point it at a local server for testing)
+    workers: number of concurrent download threads (default: 4)
+    rate: requests per second allowed across all workers; the default keeps the
+        original one request every 4 s to TappedOut (default: 0.25)
+    burst: number of requests that may be sent back to back (default: 1)
+    max_retries: attempts after the first on 429/5xx or connection errors (default: 4)
+    backoff: base delay in seconds for exponential backoff between retries (default: 2.0)
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        workers: int = 4,
+        rate: float = 0.25,
+        burst: int = 1,
+        max_retries: int = 4,
+        backoff: float = 2.0,
+        timeout: float = 30.0,
+    ):
+        self.base_url = base_url
+        self.workers = workers
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.local = threading.local()
+        self.sessions = []
+        self.lock = threading.Lock()
+
+    def get_session(self) -> requests.Session:
+        """Return this thread's keep-alive session, creating it on first use"""
+
+        if not hasattr(self.local, "session"):
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self.local.session = session
+            with self.lock:
+                self.sessions.append(session)
+
+        return self.local.session
+
+    def fetch(self, deck: str, headers: dict = None) -> requests.Response:
+        """Download one deck page, retrying with backoff on 429/5xx"""
+
+        url = self.base_url + deck
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                response = self.get_session().get(
+                    url, headers=headers, timeout=self.timeout
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * 2**attempt
+            else:
+                if response.status_code not in retry_statuses:
+                    response.raise_for_status()
+                    return response
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+                delay = retry_after(response) or self.backoff * 2**attempt
+
+            print(f"    Retrying {deck} in {delay:.1f} s")
+            time.sleep(delay)
+
+    def download(
+        self,
+        deck_names: list[str],
+        handle: Callable[[str, requests.Response], None],
+        headers: Callable[[str], dict] = None,
+    ) -> dict[str, int]:
+        """Download every deck and pass each response to handle(deck, response).
+        Only twice as many fetches as workers are queued at once, so a handle that
+        blocks also holds back further downloads.
+        headers: optional function giving extra request headers for a deck
+        Returns counts of downloaded, unchanged (304) and failed decks.
+        """
+
+        stats = {"downloaded": 0, "unchanged": 0, "failed": 0, "bytes": 0}
+        start = time.perf_counter()
+        remaining = iter(deck_names)
+        futures = {}
+        n = 0
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                while True:
+                    for deck in islice(remaining, 2 * self.workers - len(futures)):
+                        future = pool.submit(
+                            self.fetch, deck, headers and headers(deck)
+                        )
+                        futures[future] = deck
+                    if not futures:
+                        break
+
+                    finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        deck = futures.pop(future)
+                        n += 1
+                        try:
+                            response = future.result()
+                            handle(deck, response)
+                        except (requests.RequestException, OSError) as e:
+                            stats["failed"] += 1
+                            print(f"    Error: Failed to download {deck} ({e})")
+                            continue
+
+                        if response.status_code == 304:
+                            stats["unchanged"] += 1
+                            print(f"    Unchanged: {deck} ({n}/{len(deck_names)})")
+                            continue
+
+                        stats["downloaded"] += 1
+                        stats["bytes"] += len(response.content)
+                        print(f"    Got deck list for {deck} ({n}/{len(deck_names)})")
+        finally:
+            for session in self.sessions:
+                session.close()
+
+        elapsed = time.perf_counter() - start
+        print(
+            f"    Downloaded {stats['downloaded']} decks",
+            f"({stats['bytes'] / 1e6:.1f} MB) in {elapsed:.1f} s",
+            f"({stats['downloaded'] / max(elapsed, 1e-9):.2f} decks/s);",
+            f"{stats['unchanged']} unchanged, {stats['failed']} failed",
+        )
+        return stats
+
+
+def retry_after(response: requests.Response) -> float:
+    """Read the delay requested by a Retry-After header, if it is given in seconds"""
+
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return 0.0
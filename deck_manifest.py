@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
+
+# Global variables
+manifest_file = "manifest.json"
+
+
+def hash_bytes(content: bytes) -> str:
+    """Return the hex digest used to detect changed deck pages"""
+
+    return hashlib.sha256(content).hexdigest()
+
+
+class DeckManifest:
+    """Per-deck download and parse state, stored as JSON alongside the deck lists.
+    Each entry holds the page's ETag and Last-Modified headers, a hash of its
+    content, and the hash and time of the last parse.
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, manifest_file)
+
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def html_path(self, deck: str) -> str:
+        return os.path.join(self.output_dir, deck + ".html")
+
+    def txt_path(self, deck: str) -> str:
+        return os.path.join(self.output_dir, deck + ".txt")
+
+    def conditional_headers(self, deck: str, path: str = None) -> dict[str, str]:
+        """Headers that let the server answer 304 if the deck hasn't changed
+        path: local copy the validators stand in for (default: the saved page)
+        """
+
+        entry = self.entries.get(deck, {})
+        if not os.path.exists(path or self.html_path(deck)):
+            return {}
+
+        headers = {}
+        if "etag" in entry:
+            headers["If-None-Match"] = entry["etag"]
+        if "last_modified" in entry:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        return headers
+
+    def record_download(self, deck: str, response: "requests.Response") -> bool:
+        """Store the validators of a response; return True if the page content changed"""
+
+        entry = self.entries.setdefault(deck, {})
+        if response.status_code == 304:
+            return False
+
+        for header, key in (("ETag", "etag"), ("Last-Modified", "last_modified")):
+            if header in response.headers:
+                entry[key] = response.headers[header]
+            else:
+                entry.pop(key, None)
+
+        content_hash = hash_bytes(response.content)
+        changed = entry.get("hash") != content_hash or not os.path.exists(
+            self.html_path(deck)
+        )
+        entry["hash"] = content_hash
+
+        return changed
+
+    def content_hash(self, deck: str) -> str:
+        """Hash of the saved page, computing it for pages saved without a manifest"""
+
+        entry = self.entries.setdefault(deck, {})
+        if "hash" not in entry:
+            with open(self.html_path(deck), "rb") as f:
+                entry["hash"] = hash_bytes(f.read())
+
+        return entry["hash"]
+
+    def needs_parse(self, deck: str) -> bool:
+        """Whether the saved page has changed since its deck list was last written"""
+
+        if not os.path.exists(self.txt_path(deck)):
+            return True
+
+        return self.entries.get(deck, {}).get("parsed_hash") != self.content_hash(deck)
+
+    def is_parsed(self, deck: str) -> bool:
+        """Whether the deck list was written from the last downloaded version of the page"""
+
+        entry = self.entries.get(deck, {})
+        return (
+            "hash" in entry
+            and entry.get("parsed_hash") == entry["hash"]
+            and os.path.exists(self.txt_path(deck))
+        )
+
+    def record_parse(self, deck: str) -> None:
+        entry = self.entries.setdefault(deck, {})
+        entry["parsed_hash"] = self.content_hash(deck)
+        entry["parsed"] = time.time()
+
+    def save(self) -> None:
+        """Write the manifest atomically so an interrupted run can't corrupt it"""
+
+        temp = self.path + ".tmp"
+        with open(temp, "w") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(temp, self.path)
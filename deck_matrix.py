@@ -0,0 +1,192 @@
+from typing import Iterable
+
+import numpy as np
+
+from deck_corpus import split_copies
+
+
+class DeckMatrix:
+    """Sparse deck x card incidence matrix in CSR form over an interned card vocabulary.
+    Row i holds the distinct cards of decks[i]: their vocabulary ids are
+    indices[indptr[i]:indptr[i + 1]] and their number of copies the same slice of copies.
+    Cards are keyed by bare name, as in the corpus postings.
+    """
+
+    def __init__(self, deck_dict: dict[str, list[str]] = None):
+        self.decks = []
+        self.cards = []
+        self.vocab = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.copies = np.zeros(0, dtype=np.int32)
+        self._rows = None
+        self._columns = None
+
+        # Each distinct deck list line, with the card and copies it stands for
+        self._lines = {}
+        self._line_cards = np.zeros(0, dtype=np.int64)
+        self._line_copies = np.zeros(0, dtype=np.int64)
+
+        if deck_dict:
+            self.extend(deck_dict)
+
+    @property
+    def n_decks(self) -> int:
+        return len(self.decks)
+
+    @property
+    def n_cards(self) -> int:
+        return len(self.cards)
+
+    def extend(self, deck_dict: dict[str, list[str]]) -> None:
+        """Append decks as new rows, growing the vocabulary as needed"""
+
+        # Intern every line in one pass; the dicts keep insertion order
+        lines = self._lines
+        lengths, ids = [], []
+        for deck, deck_list in deck_dict.items():
+            self.decks.append(deck)
+            before = len(ids)
+            ids.extend(lines.setdefault(line, len(lines)) for line in deck_list if line)
+            lengths.append(len(ids) - before)
+
+        # Read each new line, such as "2 island", as a card and its copies
+        vocab = self.vocab
+        new_lines = [
+            split_copies(line) for line in list(lines)[len(self._line_cards) :]
+        ]
+        self._line_cards = np.concatenate(
+            (
+                self._line_cards,
+                np.array(
+                    [vocab.setdefault(card, len(vocab)) for card, _ in new_lines],
+                    dtype=np.int64,
+                ),
+            )
+        )
+        self._line_copies = np.concatenate(
+            (self._line_copies, np.array([n for _, n in new_lines], dtype=np.int64))
+        )
+        self.cards.extend(list(vocab)[len(self.cards) :])
+
+        # Collapse repeated cards within a deck into one entry, summing their copies
+        ids = np.array(ids, dtype=np.int64)
+        rows = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+        keys, inverse = np.unique(
+            rows * max(self.n_cards, 1) + self._line_cards[ids],
+            return_inverse=True,
+        )
+        copies = np.bincount(
+            inverse, weights=self._line_copies[ids], minlength=len(keys)
+        )
+        new_rows, indices = np.divmod(keys, max(self.n_cards, 1))
+
+        self.indptr = np.concatenate(
+            (
+                self.indptr,
+                self.indptr[-1]
+                + np.cumsum(np.bincount(new_rows, minlength=len(lengths))),
+            )
+        )
+        self.indices = np.concatenate((self.indices, indices.astype(np.int32)))
+        self.copies = np.concatenate((self.copies, copies.astype(np.int32)))
+        self._rows = None
+        self._columns = None
+
+    @property
+    def rows(self) -> np.ndarray:
+        """Row (deck) number of every stored entry, i.e. the COO row array"""
+
+        if self._rows is None:
+            self._rows = np.repeat(
+                np.arange(self.n_decks, dtype=np.int32), np.diff(self.indptr)
+            )
+        return self._rows
+
+    @property
+    def columns(self) -> tuple[np.ndarray, np.ndarray]:
+        """CSC view of the matrix: the rows (decks) containing vocabulary card j
+        are deck_rows[colptr[j]:colptr[j + 1]]. Returns (colptr, deck_rows).
+        """
+
+        if self._columns is None:
+            colptr = np.zeros(self.n_cards + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=self.n_cards), out=colptr[1:])
+            order = np.argsort(self.indices, kind="stable")
+            self._columns = (colptr, self.rows[order])
+        return self._columns
+
+    def card_mask(self, cards: Iterable[str]) -> np.ndarray:
+        """Boolean vector over the vocabulary marking the given cards"""
+
+        mask = np.zeros(self.n_cards, dtype=bool)
+        mask[[self.vocab[card] for card in cards if card in self.vocab]] = True
+        return mask
+
+    def card_frequency(self, decks: Iterable[str] = None) -> np.ndarray:
+        """Total copies of each vocabulary card across all decks, or just the named ones"""
+
+        if decks is None:
+            indices, copies = self.indices, self.copies
+        else:
+            selected = np.zeros(self.n_decks, dtype=bool)
+            row_of = {deck: row for row, deck in enumerate(self.decks)}
+            selected[[row_of[deck] for deck in decks]] = True
+            entries = selected[self.rows]
+            indices, copies = self.indices[entries], self.copies[entries]
+
+        return np.bincount(indices, weights=copies, minlength=self.n_cards)
+
+    def deck_frequency(self) -> np.ndarray:
+        """Number of decks containing each vocabulary card"""
+
+        return np.bincount(self.indices, minlength=self.n_cards)
+
+    def count_in_set(self, cards: Iterable[str]) -> np.ndarray:
+        """Number of distinct cards from the set in each deck"""
+
+        hits = self.card_mask(cards)[self.indices]
+        return np.bincount(self.rows, weights=hits, minlength=self.n_decks).astype(int)
+
+    def decks_with_any(self, cards: Iterable[str]) -> np.ndarray:
+        """Boolean vector over the decks marking those containing any of the cards"""
+
+        return self.count_in_set(cards) > 0
+
+    def cooccurrence(self, card: str) -> np.ndarray:
+        """Number of decks containing both card and each vocabulary card.
+        Only the rows of the decks containing the card are read, found through the CSC view.
+        """
+
+        if card not in self.vocab:
+            return np.zeros(self.n_cards, dtype=np.int64)
+
+        colptr, deck_rows = self.columns
+        id = self.vocab[card]
+        rows = deck_rows[colptr[id] : colptr[id + 1]]
+
+        return np.bincount(self.indices[self.row_entries(rows)], minlength=self.n_cards)
+
+    def row_entries(self, rows: np.ndarray) -> np.ndarray:
+        """Positions in indices and copies of every entry of the given rows, row by row"""
+
+        # Each row's start plus 0, 1, 2, ...
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return offsets + np.arange(len(offsets))
+
+    def remove(self, decks: Iterable[str]) -> None:
+        """Drop the rows of the given decks; the vocabulary is kept as it is"""
+
+        dropped = np.zeros(self.n_decks, dtype=bool)
+        row_of = {deck: row for row, deck in enumerate(self.decks)}
+        dropped[[row_of[deck] for deck in decks]] = True
+
+        kept = ~dropped[self.rows]
+        self.indptr = np.concatenate(([0], np.cumsum(np.diff(self.indptr)[~dropped])))
+        self.indices = self.indices[kept]
+        self.copies = self.copies[kept]
+        self.decks = [deck for deck, gone in zip(self.decks, dropped) if not gone]
+        self._rows = None
+        self._columns = None
@@ -0,0 +1,245 @@
+import errno
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import requests
+
+from card_search import (
+    download_rate,
+    download_workers,
+    parse_deck_list,
+    parse_workers,
+    strip_single,
+    tappedout,
+    write_deck_list,
+)
+from deck_corpus import DeckCorpus, corpus_file
+from deck_downloader import DeckDownloader
+from deck_manifest import DeckManifest
+
+# Global variables
+queue_size = 16  # pages or deck lists waiting between two stages
+store_batch = 50  # deck lists written to the corpus per transaction
+done = None  # sent through a queue after the last item
+
+
+def parse_page(html: str) -> tuple[list[str], float]:
+    """Parse one deck page in a worker process; returns the cards and the CPU time taken"""
+
+    start = time.process_time()
+    deck_list = [strip_single(card) for card in parse_deck_list(html)]
+
+    return deck_list, time.process_time() - start
+
+
+class DeckPipeline:
+    """Download, parse and store deck lists as three overlapping stages.
+    Downloaded pages pass through a bounded queue to a pool of parser processes,
+    and the parsed deck lists through a second bounded queue to one thread that
+    writes the corpus. A full queue blocks the stage feeding it, so a slow parser
+    or store throttles the downloads instead of letting pages pile up in memory.
+    incremental: send conditional requests and skip decks already parsed from the same page (default: True)
+    keep_html: also save each downloaded page (default: False)
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        base_url: str = None,
+        incremental: bool = True,
+        keep_html: bool = False,
+        workers: int = parse_workers,
+        queue_size: int = queue_size,
+    ):
+        self.output_dir = output_dir
+        self.base_url = base_url or tappedout + "mtg-decks/"
+        self.incremental = incremental
+        self.keep_html = keep_html
+        self.workers = workers
+        self.pages = queue.Queue(maxsize=queue_size)
+        self.lists = queue.Queue(maxsize=queue_size)
+        self.timings = {"download": 0.0, "blocked": 0.0, "parse": 0.0, "store": 0.0}
+        self.parsed, self.failed = 0, []
+        self.error = None
+
+    def run(self, deck_names: list[str]) -> dict[str, object]:
+        """Refresh the given decks; returns the download counts, the number of decks
+        parsed, those that failed to parse, and the time spent in each stage
+        """
+
+        if not os.path.exists(self.output_dir):
+            os.mkdir(self.output_dir)
+        if not os.path.isdir(self.output_dir):
+            raise FileNotFoundError(
+                errno.ENOENT, os.strerror(errno.ENOENT), self.output_dir
+            )
+
+        start = time.perf_counter()
+        self.manifest = DeckManifest(self.output_dir)
+        self.corpus_path = os.path.join(self.output_dir, corpus_file)
+        with DeckCorpus(self.corpus_path) as corpus:
+            self.stored = set(corpus.names())
+
+        stages = [
+            threading.Thread(target=self.parse_stage),
+            threading.Thread(target=self.store_stage),
+        ]
+        for stage in stages:
+            stage.start()
+
+        downloader = DeckDownloader(
+            self.base_url, workers=download_workers, rate=download_rate
+        )
+        try:
+            stats = downloader.download(
+                deck_names, self.queue_page, self.headers if self.incremental else None
+            )
+            self.timings["download"] = (
+                time.perf_counter() - start - self.timings["blocked"]
+            )
+        finally:
+            self.pages.put(done)
+            for stage in stages:
+                stage.join()
+            self.manifest.save()
+
+        if self.error is not None:
+            raise self.error
+
+        self.timings["total"] = time.perf_counter() - start
+        print(
+            f"    Parsed {self.parsed} deck lists in {self.timings['total']:.1f} s:",
+            f"download {self.timings['download']:.1f} s",
+            f"(blocked on full queue {self.timings['blocked']:.1f} s),",
+            f"parse {self.timings['parse']:.1f} s CPU,",
+            f"store {self.timings['store']:.1f} s",
+        )
+        if self.failed:
+            print(
+                f"    Failed to parse {len(self.failed)} deck lists: {', '.join(self.failed)}"
+            )
+
+        print("")
+        return {
+            **stats,
+            "parsed": self.parsed,
+            "parse_failed": self.failed,
+            "timings": self.timings,
+        }
+
+    def headers(self, deck: str) -> dict[str, str]:
+        # A 304 is only safe once the current page's deck list is in the corpus
+        if not (self.manifest.is_parsed(deck) and deck in self.stored):
+            return {}
+        if self.keep_html:
+            return self.manifest.conditional_headers(deck)
+        return self.manifest.conditional_headers(deck, self.manifest.txt_path(deck))
+
+    def queue_page(self, deck: str, response: requests.Response) -> None:
+        """Download stage: hand a page to the parsers, blocking while the queue is full"""
+
+        changed = self.manifest.record_download(deck, response)
+        if response.status_code == 304:
+            return
+        if self.keep_html and (changed or not self.incremental):
+            with open(self.manifest.html_path(deck), "w", encoding="utf-8") as f:
+                f.write(response.text)
+        elif changed and os.path.exists(self.manifest.html_path(deck)):
+            # The validators now describe the new page, so an older saved copy would
+            # be answered with 304 and never replaced
+            os.remove(self.manifest.html_path(deck))
+        if self.incremental and self.manifest.is_parsed(deck) and deck in self.stored:
+            return
+
+        start = time.perf_counter()
+        self.pages.put((deck, response.text))
+        self.timings["blocked"] += time.perf_counter() - start
+
+    def parse_stage(self) -> None:
+        """Parse stage: keep the worker processes busy with at most two pages each"""
+
+        # Workers start at the first submit, while the download threads run and may hold
+        # locks such as stdout's; a forked worker would inherit them held, so fork the
+        # workers from a clean server process that has already imported this module
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload([__name__])
+        else:
+            context = None
+
+        pending, item = deque(), ()
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=context
+            ) as pool:
+                while True:
+                    # Pass on finished deck lists in order, waiting once every worker is busy
+                    while pending and (
+                        pending[0][1].done() or len(pending) >= 2 * self.workers
+                    ):
+                        self.forward(*pending.popleft())
+
+                    try:
+                        item = self.pages.get(timeout=0.1 if pending else None)
+                    except queue.Empty:
+                        continue
+                    if item is done:
+                        break
+
+                    deck, html = item
+                    pending.append((deck, pool.submit(parse_page, html)))
+
+                while pending:
+                    self.forward(*pending.popleft())
+        except BaseException as e:
+            self.error = e
+            # Keep draining so the download stage never blocks on a dead consumer
+            while item is not done:
+                item = self.pages.get()
+        finally:
+            self.lists.put(done)
+
+    def forward(self, deck: str, future: Future) -> None:
+        try:
+            deck_list, cpu = future.result()
+        except Exception as e:
+            print(f"    Error: Failed to parse {deck} ({e})")
+            deck_list, cpu = [], 0.0
+
+        self.timings["parse"] += cpu
+        self.lists.put((deck, deck_list))
+
+    def store_stage(self) -> None:
+        """Store stage: write deck lists and the corpus in batched transactions"""
+
+        batch, item = {}, ()
+        try:
+            with DeckCorpus(self.corpus_path) as corpus:
+                while (item := self.lists.get()) is not done:
+                    start = time.perf_counter()
+                    deck, deck_list = item
+                    if deck_list:
+                        write_deck_list(self.manifest.txt_path(deck), deck_list)
+                        self.manifest.record_parse(deck)
+                        batch[deck] = deck_list
+                        self.parsed += 1
+                    else:
+                        self.failed.append(deck)
+
+                    if len(batch) >= store_batch:
+                        corpus.update(batch)
+                        batch = {}
+                    self.timings["store"] += time.perf_counter() - start
+
+                start = time.perf_counter()
+                corpus.update(batch)
+                self.timings["store"] += time.perf_counter() - start
+        except BaseException as e:
+            self.error = e
+            while item is not done:
+                item = self.lists.get()
@@ -0,0 +1,128 @@
+import numpy as np
+
+from deck_matrix import DeckMatrix
+
+# Global variables
+mersenne_prime = (1 << 31) - 1
+
+
+class DeckSimilarity:
+    """MinHash signatures and locality-sensitive hashing over the decks of a DeckMatrix.
+    Each deck gets num_perm min-hashes of its card ids; the signature is cut into
+    bands, and only decks sharing an identical band are compared exactly, so
+    finding similar decks never needs every pair.
+    num_perm: number of hash functions per signature (default: 128)
+    bands: number of LSH bands, which must divide num_perm; more bands find lower similarities (default: 32)
+    """
+
+    def __init__(
+        self,
+        matrix: DeckMatrix,
+        num_perm: int = 128,
+        bands: int = 32,
+        seed: int = 1,
+        chunk_size: int = 1000,
+    ):
+        if num_perm % bands:
+            raise ValueError("bands must divide num_perm")
+
+        self.matrix = matrix
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.row_of = {deck: i for i, deck in enumerate(matrix.decks)}
+
+        # Universal hashing (a * x + b) mod p of every card id, one row per hash function
+        rng = np.random.default_rng(seed)
+        a = rng.integers(1, mersenne_prime, num_perm, dtype=np.uint64)[:, None]
+        b = rng.integers(0, mersenne_prime, num_perm, dtype=np.uint64)[:, None]
+        ids = np.arange(matrix.n_cards, dtype=np.uint64)[None, :]
+        card_hashes = ((a * ids + b) % mersenne_prime).astype(np.uint32)
+
+        self.signatures = np.full(
+            (num_perm, matrix.n_decks), np.iinfo(np.uint32).max, dtype=np.uint32
+        )
+        for r0 in range(0, matrix.n_decks, chunk_size):
+            r1 = min(r0 + chunk_size, matrix.n_decks)
+            start, end = matrix.indptr[r0], matrix.indptr[r1]
+            offsets = matrix.indptr[r0:r1] - start
+            nonempty = np.diff(matrix.indptr[r0 : r1 + 1]) > 0
+            if start == end:
+                continue
+            self.signatures[:, r0:r1][:, nonempty] = np.minimum.reduceat(
+                card_hashes[:, matrix.indices[start:end]], offsets[nonempty], axis=1
+            )
+
+        # One sorted array of band keys per band; equal keys are LSH buckets
+        multipliers = rng.integers(1, 1 << 63, self.rows_per_band, dtype=np.uint64)
+        self.keys = np.empty((bands, matrix.n_decks), dtype=np.uint64)
+        self.band_keys, self.band_order = [], []
+        r = self.rows_per_band
+        for band in range(bands):
+            rows = self.signatures[band * r : (band + 1) * r].astype(np.uint64)
+            self.keys[band] = (rows * multipliers[:, None]).sum(axis=0)
+            order = np.argsort(self.keys[band], kind="stable")
+            self.band_keys.append(self.keys[band][order])
+            self.band_order.append(order)
+
+    def cards(self, row: int) -> np.ndarray:
+        indptr = self.matrix.indptr
+        return self.matrix.indices[indptr[row] : indptr[row + 1]]
+
+    def jaccard(self, i: int, j: int) -> float:
+        """Exact Jaccard similarity of the card sets of decks i and j"""
+
+        a, b = self.cards(i), self.cards(j)
+        if not len(a) and not len(b):
+            return 1.0
+        shared = len(np.intersect1d(a, b, assume_unique=True))
+        return shared / (len(a) + len(b) - shared)
+
+    def estimate(self, i: int, j: int) -> float:
+        """Jaccard similarity estimated from the MinHash signatures"""
+
+        return float(np.mean(self.signatures[:, i] == self.signatures[:, j]))
+
+    def candidates(self, row: int) -> set[int]:
+        """Decks sharing at least one band bucket with a deck"""
+
+        found = set()
+        for band in range(self.bands):
+            keys, key = self.band_keys[band], self.keys[band, row]
+            lo, hi = np.searchsorted(keys, key), np.searchsorted(keys, key, "right")
+            found.update(self.band_order[band][lo:hi].tolist())
+
+        found.discard(row)
+        return found
+
+    def similar(self, deck: str, n: int = 10) -> list[tuple[str, float]]:
+        """The n decks most similar to the given one, with their exact Jaccard similarity"""
+
+        row = self.row_of[deck]
+        scored = [(self.jaccard(row, other), other) for other in self.candidates(row)]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+
+        return [(self.matrix.decks[other], score) for score, other in scored[:n]]
+
+    def pairs(self, threshold: float = 0.8) -> list[tuple[str, str, float]]:
+        """All pairs of decks with exact Jaccard similarity of at least threshold"""
+
+        candidates = set()
+        for keys, order in zip(self.band_keys, self.band_order):
+            # Runs of equal keys in the sorted band are the buckets
+            edges = np.flatnonzero(np.diff(keys)) + 1
+            for bucket in np.split(order, edges):
+                if len(bucket) < 2:
+                    continue
+                bucket = np.sort(bucket).tolist()
+                for x, i in enumerate(bucket):
+                    candidates.update((i, j) for j in bucket[x + 1 :])
+
+        results = []
+        for i, j in candidates:
+            # The estimate is cheap; only plausible pairs get the exact comparison
+            if self.estimate(i, j) < threshold - 0.15:
+                continue
+            if (score := self.jaccard(i, j)) >= threshold:
+                results.append((self.matrix.decks[i], self.matrix.decks[j], score))
+
+        return sorted(results, key=lambda item: -item[2])
@@ -6,17 +6,37 @@ For the smaller version that excludes the plotting option, see https://drive.goo
 This work is licensed under a Creative Commons Attribution-ShareAlike 4.0 International License. Original author is dude1818 on PucaTrade.com (https://pucatrade.com/profiles/show/129317)
 """
 
-from requests import Session
+from requests import RequestException, Session
+from array import array
 from pprint import pformat
-from re import findall
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import struct
+import sys
+import threading
+import time
 
 # Requires version 3.2.2 to build the exe
 import matplotlib.pyplot as plt
 
 
 # Global variables
-root_url = "https://pucatrade.com"
+# Set PUCATRADE_URL to run against another server, such as a local test server
+root_url = os.environ.get("PUCATRADE_URL", "https://pucatrade.com")
 login_url = root_url + "/login"
+fetch_workers = 4  # ledger pages downloaded at the same time
+max_retries = 3
+retry_statuses = (429, 500, 502, 503, 504)
+cache_dir = "ledger_cache"
+table_file = "puca_ledger.bin"
+table_magic = b"PUCALEDGER1\n"
+number_pattern = re.compile(r"\d+")
 
 
 def get_query():
@@ -26,17 +46,21 @@ def get_query():
     print("    (T)ransactions (sends/receives, fees, etc.)")
     print("    (D)istribution of card values sent/received")
     print("    (E)xport entire ledger")
+    print("    (A)ll of the above from a single pass over the ledger")
+    print("    (S)ummary and distribution from the ledger saved by E or A")
+    print("    (P)urge cached ledger pages (%i pages, %.1f MB)" % cache_usage())
 
     query = input("").upper()
-    while query not in ("T", "D", "E"):
-        print("Please enter T, D, or E")
+    while query not in ("T", "D", "E", "A", "S", "P"):
+        print("Please enter T, D, E, A, S, or P")
         query = input("").upper()
 
     return query
 
 
 def get_session():
-    """Open the session on pucatrade.com"""
+    """Log in to pucatrade.com, returning the first ledger page, the open session
+    and the account name"""
 
     # Necessary login information
     username = input("Email address: ")
@@ -46,11 +70,11 @@ def get_session():
     url = root_url + "/account/ledger/2012-01"
     payload = {"login": username, "password": password}
 
-    with Session() as session:
-        post = session.post(login_url, data=payload)
-        r = session.get(url)
+    session = Session()
+    post = session.post(login_url, data=payload)
+    r = session.get(url)
 
-    return r, payload
+    return r, session, username
 
 
 def get_urls(r):
@@ -66,47 +90,225 @@ def get_urls(r):
     return urls
 
 
-def get_transactions(urls, payload):
-    """Go through each page of ledger and sum up entries"""
+def parse_ledger_page(text):
+    """Split one page of the ledger into Transaction objects"""
 
-    transactions = {}
-    type_flag = '<div class="label letter">TYPE</div>'
-    points_flag = '<div class="label letter">POINTS</div>'
+    transaction_start_string = '<div class="column sender">'
+    transaction_text_blocks = text.split(transaction_start_string)[2:]
 
-    with Session() as session:
-        post = session.post(login_url, data=payload)
-        for url in urls:
-            r = session.get(url)
-            trans_list = r.text.split(type_flag)[1:]
-            print(
-                f"    Adding %i transactions from %s"
-                % (len(trans_list), url.split("/")[-1])
-            )
+    # Remove non-ASCII characters to prevent usernames
+    # with unusual characters from causing a crash later
+    return [
+        Transaction(ttb.encode("ascii", "ignore").decode("ascii"))
+        for ttb in transaction_text_blocks
+    ]
 
-            for transaction in trans_list:
-                type = transaction.split('"value letter">')[1].split("</div>")[0]
-                points = (
-                    transaction.split("POINTS")[1]
-                    .split('"value">')[1]
-                    .split("</div>")[0]
-                    .strip()
-                )
-                if "Gift" in points:
-                    points = 0
-                else:
-                    points = int(points)
 
-                if points > 0:
-                    type += "_incoming"
-                elif points < 0:
-                    type += "_outgoing"
+def cache_usage(directory=cache_dir):
+    """Number of cached ledger pages and their size in MB"""
 
-                if type in transactions.keys():
-                    transactions[type] += points
-                else:
-                    transactions[type] = points
+    files, size = 0, 0
+    for root, dirs, names in os.walk(directory):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(root, name))
+
+    return files, size / 1e6
+
+
+def purge_cache(directory=cache_dir):
+    """Delete every cached ledger page"""
+
+    files, size = cache_usage(directory)
+    shutil.rmtree(directory, ignore_errors=True)
+    print("Deleted %i cached pages (%.1f MB)" % (files, size))
+
+
+class LedgerCache:
+    """Gzipped copies of ledger pages on disk, one directory per account.
+    A month is closed once it is older than last month, and the page of a
+    closed month never changes, so it is only downloaded once. The current
+    and last month are always downloaded again"""
+
+    def __init__(self, account, directory=cache_dir, today=None):
+        key = hashlib.sha256(account.strip().lower().encode()).hexdigest()[:16]
+        self.dir = os.path.join(directory, key)
+        os.makedirs(self.dir, exist_ok=True)
+
+        today = today or date.today()
+        year, month = divmod(today.year * 12 + today.month - 2, 12)
+        self.last_month = "%04i-%02i" % (year, month + 1)
+        self.hits, self.stored = 0, 0
+        self.lock = threading.Lock()
+
+    def is_closed(self, month):
+        return month < self.last_month
+
+    def path(self, month):
+        return os.path.join(self.dir, month + ".html.gz")
+
+    def get(self, month):
+        """Return the cached page of a closed month, or None"""
+
+        if not self.is_closed(month):
+            return None
+
+        try:
+            with gzip.open(self.path(month), "rt", encoding="utf-8") as f:
+                text = f.read()
+        except (OSError, EOFError):
+            # Missing, or left unreadable by an interrupted run
+            return None
+
+        with self.lock:
+            self.hits += 1
+        return text
+
+    def put(self, month, text):
+        """Store the page of a closed month; pages of open months are not kept"""
+
+        if not self.is_closed(month):
+            return
+
+        # Write to a temporary file first so an interrupted run can't leave a partial page
+        temp = self.path(month) + ".tmp"
+        with gzip.open(temp, "wt", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp, self.path(month))
+
+        with self.lock:
+            self.stored += 1
+
+    def usage(self):
+        return cache_usage(self.dir)
+
+
+class LedgerFetcher:
+    """Download ledger pages concurrently. Each worker thread gets its own
+    session carrying the cookies of the logged-in one, so there is only
+    one login however many pages are fetched at once"""
+
+    def __init__(
+        self,
+        session,
+        workers=fetch_workers,
+        retries=max_retries,
+        backoff=1.0,
+        cache=None,
+    ):
+        self.cookies = session.cookies
+        self.headers = session.headers
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = cache
+        self.local = threading.local()
+        self.sessions = []
+        self.lock = threading.Lock()
+
+    def get_session(self):
+        if not hasattr(self.local, "session"):
+            session = Session()
+            session.headers.update(self.headers)
+            session.cookies.update(self.cookies)
+            with self.lock:
+                self.sessions.append(session)
+            self.local.session = session
+
+        return self.local.session
+
+    def fetch(self, url):
+        """Return one page, from the cache if possible"""
+
+        month = url.split("/")[-1]
+        if self.cache:
+            text = self.cache.get(month)
+            if text is not None:
+                return text
+
+        text = self.download(url)
+        if self.cache:
+            self.cache.put(month, text)
+
+        return text
+
+    def download(self, url):
+        """Download one page, retrying connection errors and 429/5xx responses"""
+
+        for attempt in range(self.retries + 1):
+            try:
+                r = self.get_session().get(url, timeout=60)
+            except RequestException:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2**attempt
+            else:
+                if r.status_code not in retry_statuses or attempt == self.retries:
+                    r.raise_for_status()
+                    if "logged-out" in r.text:
+                        raise RuntimeError("Logged out while reading %s" % url)
+                    return r.text
+
+                try:
+                    delay = float(r.headers.get("Retry-After", ""))
+                except ValueError:
+                    delay = self.backoff * 2**attempt
+
+            print("    Retrying %s in %.1f s" % (url.split("/")[-1], delay))
+            time.sleep(delay)
+
+    def pages(self, urls):
+        """Yield the url and text of each page in the order of urls,
+        while the following pages download in the background"""
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                yield from zip(urls, pool.map(self.fetch, urls))
+        finally:
+            for session in self.sessions:
+                session.close()
+
+
+def crawl_ledger(session, urls, consumers, workers=fetch_workers, cache=None):
+    """Download each page of the ledger once and pass every transaction
+    on it to each of the consumers, in ledger order
+    cache: LedgerCache to read closed months from and store them in"""
+
+    for url, text in LedgerFetcher(session, workers, cache=cache).pages(urls):
+        transactions = parse_ledger_page(text)
+        print(
+            f"    Adding %i transactions from %s"
+            % (len(transactions), url.split("/")[-1])
+        )
+
+        for transaction in transactions:
+            for consumer in consumers:
+                consumer.add(transaction)
+
+    if cache:
+        print(
+            "    Read %i pages from the cache, downloaded %i (cache: %i pages, %.1f MB)"
+            % ((cache.hits, len(urls) - cache.hits) + cache.usage())
+        )
+
+
+class TransactionSummary:
+    """Sum up the points of each type of transaction, split into incoming and outgoing"""
 
-    return transactions
+    def __init__(self):
+        self.transactions = {}
+
+    def add(self, transaction):
+        type = transaction.ledger_type
+        if transaction.points > 0:
+            type += "_incoming"
+        elif transaction.points < 0:
+            type += "_outgoing"
+
+        if type in self.transactions.keys():
+            self.transactions[type] += transaction.points
+        else:
+            self.transactions[type] = transaction.points
 
 
 def get_transaction_stats(transactions, fout):
@@ -174,45 +376,19 @@ def print_transactions(text, fout):
         f.write(text + "\n")
 
 
-def get_values(urls, payload):
-    """Go through each page of ledger and collect value of each card"""
-
-    sending, receiving = [], []
-    type_flag = '<div class="label letter">TYPE</div>'
-    points_flag = '<div class="label letter">POINTS</div>'
-
-    with Session() as session:
-        post = session.post(login_url, data=payload)
-        for url in urls:
-            r = session.get(url)
-            trans_list = r.text.split(type_flag)[1:]
-            print(
-                f"    Adding %i transactions from %s"
-                % (len(trans_list), url.split("/")[-1])
-            )
-
-            for transaction in trans_list:
-                type = transaction.split('"value letter">')[1].split("</div>")[0]
-
-                if type == "TRADE":
-                    points = (
-                        transaction.split("POINTS")[1]
-                        .split('"value">')[1]
-                        .split("</div>")[0]
-                        .strip()
-                    )
+class ValueDistribution:
+    """Collect the value of each card sent or received in a trade"""
 
-                    if "Gift" in points:
-                        continue
-                    else:
-                        points = int(points)
+    def __init__(self):
+        self.sending, self.receiving = [], []
 
-                    if points > 0:
-                        sending.append(points)
-                    else:
-                        receiving.append(-1 * points)
-
-    return sending, receiving
+    def add(self, transaction):
+        # Gift trades have no point value and are typed GIFT
+        if transaction.type == "TRADE":
+            if transaction.points > 0:
+                self.sending.append(transaction.points)
+            else:
+                self.receiving.append(-1 * transaction.points)
 
 
 def make_histogram(sending, receiving):
@@ -274,24 +450,59 @@ def get_name_and_id(s):
     return quote_if_has_comma(name), id
 
 
+def get_user(s):
+    """User name and ID of a sender or receiver, or the bare text and -1
+    if it isn't a profile link"""
+
+    try:
+        return get_name_and_id(s)
+    except (IndexError, ValueError):
+        return quote_if_has_comma(s), -1
+
+
 class Transaction:
-    sender_name = ""
-    sender_id = -1
-    receiver_name = ""
-    receiver_id = -1
-    type = ""
-    notes = ""
-    package_id = ""
-    card_id = ""
-    card_name = ""
-    foil = False
-    points = 0
-    running_total = 0
-    date = ""
-    time = ""
+    # Slots instead of a __dict__ per instance keep large ledgers small in memory
+    __slots__ = (
+        "sender_name",
+        "sender_id",
+        "receiver_name",
+        "receiver_id",
+        "type",
+        "ledger_type",
+        "notes",
+        "package_id",
+        "card_id",
+        "card_name",
+        "foil",
+        "foil_id",
+        "points",
+        "running_total",
+        "date",
+        "time",
+    )
 
     # Create a Transaction object from a transaction text block
-    def __init__(self, ttb):
+    def __init__(self, ttb=None):
+        self.sender_name = ""
+        self.sender_id = -1
+        self.receiver_name = ""
+        self.receiver_id = -1
+        self.type = ""
+        self.ledger_type = ""
+        self.notes = ""
+        self.package_id = ""
+        self.card_id = ""
+        self.card_name = ""
+        self.foil = False
+        self.foil_id = False
+        self.points = 0
+        self.running_total = 0
+        self.date = ""
+        self.time = ""
+
+        if ttb is None:
+            return
+
         keysplits = ttb.split('<div class="label')
         valuesplits = ttb.split('<div class="value')
         for iks, keysplit in enumerate(keysplits):
@@ -304,8 +515,10 @@ class Transaction:
             value = valuesplit[va:vb].strip()
 
             if key == "SENDER":
-                self.sender_name, self.sender_id = get_name_and_id(value)
+                self.sender_name, self.sender_id = get_user(value)
             elif key == "TYPE":
+                # The type as shown in the ledger, before any renaming
+                self.ledger_type = value
                 if value == "WANT":
                     self.type = "TRADE FEE"
                 else:
@@ -325,25 +538,30 @@ class Transaction:
                     # Not a gift
                     self.points = int(value.replace(",", ""))
             elif key == "RUNNING":
-                self.running_total = int(value.split(">")[-1].replace(",", ""))
+                try:
+                    self.running_total = int(value.split(">")[-1].replace(",", ""))
+                except ValueError:
+                    pass
             elif key == "RECEIVER":
-                self.receiver_name, self.receiver_id = get_name_and_id(value)
+                self.receiver_name, self.receiver_id = get_user(value)
             elif key == "DATE":
                 s2 = value.split(" ")
                 self.date = s2[0]
-                self.time = s2[1]
+                self.time = s2[1] if len(s2) > 1 else ""
 
         # Decide what to do with the information in the
         # "notes" field. This depends on the transaction type.
         if self.type == "TRADE":
-            # Get the card name, card ID, package ID, and foil identifier
-            numbers = findall(r"\d+", self.notes)
-            self.package_id = numbers[0]
-            self.card_id = numbers[2]
-            self.foil_id = numbers[3] == 0
-            self.card_name = quote_if_has_comma(
-                self.notes.split("</a>")[-2].split(">")[-1]
-            )
+            # Get the card name, card ID, package ID, and foil identifier.
+            # Notes in another format leave them blank rather than stopping
+            # the reports that only need the type and points
+            numbers = number_pattern.findall(self.notes)
+            links = self.notes.split("</a>")
+            if len(numbers) >= 4 and len(links) >= 2:
+                self.package_id = numbers[0]
+                self.card_id = numbers[2]
+                self.foil_id = numbers[3] == 0
+                self.card_name = quote_if_has_comma(links[-2].split(">")[-1])
 
     # Return a string representation of this Transaction
     # suitable for a CSV file.
@@ -384,47 +602,193 @@ class Transaction:
             return "PUCASHIELD for %d\n" % self.points
 
 
-def get_all_transactions(urls, payload, csvfilename):
-    """Go through each page of ledger and sum up entries"""
+class LedgerExport:
+    """Write every transaction to a CSV file"""
 
     csv_header = "Package ID,Transaction Type,Points,Balance,Sender,Sender ID,Receiver,Receiver ID,Card name,Card ID,Foil,Date,Time\n"
-    transaction_start_string = '<div class="column sender">'
 
-    with open(csvfilename, "w") as f:
-        f.write(csv_header)
-        with Session() as session:
-            post = session.post(login_url, data=payload)
-            for url in urls:
-                r = session.get(url)
-                transaction_text_blocks = r.text.split(transaction_start_string)[2:]
-                print(
-                    f"    Adding %i transactions from %s"
-                    % (len(transaction_text_blocks), url.split("/")[-1])
-                )
+    def __init__(self, csvfilename):
+        self.csvfilename = csvfilename
+        self.f = open(csvfilename, "w")
+        self.f.write(self.csv_header)
+
+    def add(self, transaction):
+        self.f.write(transaction.csv_row())
+
+    def close(self):
+        self.f.close()
+
+
+class TransactionTable:
+    """Column-oriented store of transactions. Numbers are kept in typed arrays,
+    and names and other text as indices into one list of distinct strings, so
+    each user and card name is stored only once. The notes are not kept"""
+
+    int_columns = {
+        "points": "q",
+        "running_total": "q",
+        "sender_id": "q",
+        "receiver_id": "q",
+        "foil": "b",
+    }
+    str_columns = (
+        "package_id",
+        "type",
+        "ledger_type",
+        "sender_name",
+        "receiver_name",
+        "card_name",
+        "card_id",
+        "date",
+        "time",
+    )
 
-                for ttb in transaction_text_blocks:
-                    # Remove non-ASCII characters to prevent usernames
-                    # with unusual characters from causing a crash later
-                    f.write(
-                        Transaction(
-                            ttb.encode("ascii", "ignore").decode("ascii")
-                        ).csv_row()
-                    )
+    def __init__(self):
+        self.strings = []
+        self.codes = {}
+        self.columns = {name: array(code) for name, code in self.int_columns.items()}
+        for name in self.str_columns:
+            self.columns[name] = array("i")
+
+    def __len__(self):
+        return len(self.columns["points"])
+
+    def intern(self, text):
+        code = self.codes.get(text)
+        if code is None:
+            code = self.codes[text] = len(self.strings)
+            self.strings.append(text)
+
+        return code
+
+    def add(self, transaction):
+        for name in self.int_columns:
+            self.columns[name].append(getattr(transaction, name))
+        for name in self.str_columns:
+            self.columns[name].append(self.intern(getattr(transaction, name)))
+
+    def __iter__(self):
+        """Rebuild the Transaction objects, e.g. to feed the reports again"""
+
+        names = tuple(self.int_columns) + self.str_columns
+        strings = self.strings
+        n_ints = len(self.int_columns)
+        for row in zip(*(self.columns[name] for name in names)):
+            transaction = Transaction()
+            for i, (name, value) in enumerate(zip(names, row)):
+                setattr(transaction, name, value if i < n_ints else strings[value])
+            transaction.foil = bool(transaction.foil)
+            yield transaction
+
+    def save(self, filename=table_file):
+        """Write the table as a JSON header with the distinct strings,
+        followed by the raw contents of each column"""
+
+        header = {
+            "rows": len(self),
+            "byteorder": sys.byteorder,
+            "columns": [
+                (name, self.columns[name].typecode, self.columns[name].itemsize)
+                for name in self.columns
+            ],
+            "strings": self.strings,
+        }
+        data = json.dumps(header).encode("utf-8")
+
+        temp = filename + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(table_magic)
+            f.write(struct.pack("<Q", len(data)))
+            f.write(data)
+            for column in self.columns.values():
+                column.tofile(f)
+        os.replace(temp, filename)
+
+    @classmethod
+    def load(cls, filename=table_file):
+        """Read a table written by save, raising ValueError if the file isn't
+        one or is incomplete"""
+
+        table = cls()
+
+        with open(filename, "rb") as f:
+            if f.read(len(table_magic)) != table_magic:
+                raise ValueError("%s is not a saved ledger" % filename)
+            try:
+                (size,) = struct.unpack("<Q", f.read(8))
+            except struct.error:
+                raise ValueError("%s is incomplete" % filename) from None
+            header = json.loads(f.read(size).decode("utf-8"))
+
+            for name, typecode, itemsize in header["columns"]:
+                column = array(typecode)
+                if column.itemsize != itemsize:
+                    raise ValueError("%s is from an incompatible system" % filename)
+                try:
+                    column.fromfile(f, header["rows"])
+                except EOFError:
+                    raise ValueError("%s is incomplete" % filename) from None
+                if header["byteorder"] != sys.byteorder:
+                    column.byteswap()
+                table.columns[name] = column
+
+        table.strings = header["strings"]
+        table.codes = {text: code for code, text in enumerate(table.strings)}
+        return table
 
 
 if __name__ == "__main__":
 
     query = get_query()
 
-    response, payload = get_session()
-    while "logged-out" in response.text:
-        print("Invalid credentials")
-        response, payload = get_session()
+    if query == "P":
+        purge_cache()
+        input("Press Enter to quit")
+        raise SystemExit
+
+    # Every report chosen is filled in from the same pass over the ledger
+    summary = TransactionSummary() if query in ("T", "A", "S") else None
+    values = ValueDistribution() if query in ("D", "A", "S") else None
+    export = LedgerExport("puca_ledger.csv") if query in ("E", "A") else None
+    table = TransactionTable() if query in ("E", "A") else None
+    consumers = [c for c in (summary, values, export, table) if c is not None]
+
+    if query == "S":
+        print("Reading %s..." % table_file)
+        try:
+            saved = TransactionTable.load(table_file)
+        except FileNotFoundError:
+            print("    Need to export the ledger with E or A first!")
+            input("Press Enter to quit")
+            raise SystemExit
+        except ValueError as e:
+            print("    %s; export the ledger again with E or A" % e)
+            input("Press Enter to quit")
+            raise SystemExit
+
+        for transaction in saved:
+            for consumer in consumers:
+                consumer.add(transaction)
 
-    urls = get_urls(response)
-
-    if query == "T":
-        transactions = get_transactions(urls, payload)
+    else:
+        response, session, account = get_session()
+        while "logged-out" in response.text:
+            print("Invalid credentials")
+            session.close()
+            response, session, account = get_session()
+
+        urls = get_urls(response)
+        cache = LedgerCache(account)
+
+        try:
+            crawl_ledger(session, urls, consumers, cache=cache)
+        finally:
+            session.close()
+            if export:
+                export.close()
+
+    if summary:
+        transactions = summary.transactions
         fout = "puca_transactions.txt"
 
         with open(fout, "w") as f:
@@ -434,8 +798,15 @@ if __name__ == "__main__":
 
         get_transaction_stats(transactions, fout)
 
-    elif query == "D":
-        sending, receiving = get_values(urls, payload)
+    if export:
+        print("Transaction summary written to %s\n" % export.csvfilename)
+
+    if table is not None:
+        table.save(table_file)
+        print("Ledger saved to %s for later summaries\n" % table_file)
+
+    if values:
+        sending, receiving = values.sending, values.receiving
         fout = "puca_histogram.txt"
 
         with open(fout, "w") as f:
@@ -445,9 +816,4 @@ if __name__ == "__main__":
 
         make_histogram(sending, receiving)
 
-    elif query == "E":
-        fout = "puca_ledger.csv"
-        get_all_transactions(urls, payload, fout)
-        print("Transaction summary written to %s\n" % fout)
-
     input("Press Enter to quit")
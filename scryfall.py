@@ -0,0 +1,207 @@
+import asyncio
+import time
+
+import aiohttp
+
+# Global variables
+scryfall_url = "https://api.scryfall.com"
+batch_size = 75  # maximum identifiers per /cards/collection request
+retry_statuses = (429, 500, 502, 503, 504)
+
+
+class ScryfallError(Exception):
+    """An error object returned by the ScryFall API, an unreadable response, or a
+    failed connection (status 0)
+    """
+
+    def __init__(self, status: int, details: str):
+        super().__init__(f"{status}: {details}")
+        self.status = status
+        self.details = details
+
+
+class CardNotFound(ScryfallError):
+    """No card matched the requested name"""
+
+    def __init__(self, name: str, details: str = "No card found"):
+        super().__init__(404, details)
+        self.name = name
+
+
+def card_keys(card: dict) -> list[str]:
+    """Normalized names a card can be requested by: its full name and each face's name"""
+
+    keys = [card["name"].lower()]
+    for face in card.get("card_faces", []):
+        keys.append(face["name"].lower())
+
+    return keys
+
+
+class ScryfallClient:
+    """Asyncio ScryFall client with one pooled HTTP session and built-in request pacing.
+    Concurrent lookups of the same name share a single request, every response is
+    decoded once, and 429/5xx responses are retried with backoff.
+    base_url: ScryFall API root (point it at a local stub server for testing)
+    rate: requests per second; ScryFall asks for at most 10 (default: 10.0)
+    connections: size of the keep-alive connection pool (default: 8)
+    """
+
+    def __init__(
+        self,
+        base_url: str = scryfall_url,
+        rate: float = 10.0,
+        connections: int = 8,
+        max_retries: int = 4,
+        backoff: float = 1.0,
+    ):
+        self.base_url = base_url
+        self.interval = 1 / rate
+        self.connections = connections
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.next_slot = 0.0
+        self.inflight = {}
+        self.session = None
+
+    async def __aenter__(self) -> "ScryfallClient":
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.connections),
+            headers={"Accept": "application/json"},
+            timeout=aiohttp.ClientTimeout(total=60),
+        )
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.session.close()
+
+    async def pace(self) -> None:
+        """Wait for the next free request slot"""
+
+        now = time.monotonic()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def request(self, method: str, path: str, **kwargs) -> dict:
+        """Send a request and return its decoded JSON, raising ScryfallError for API errors.
+        429/5xx responses and connection errors are retried with backoff.
+        """
+
+        for attempt in range(self.max_retries + 1):
+            await self.pace()
+            try:
+                async with self.session.request(
+                    method, self.base_url + path, **kwargs
+                ) as response:
+                    if response.status in retry_statuses and attempt < self.max_retries:
+                        try:
+                            delay = float(response.headers.get("Retry-After", ""))
+                        except ValueError:
+                            delay = self.backoff * 2**attempt
+                        await asyncio.sleep(delay)
+                        continue
+
+                    try:
+                        data = await response.json(content_type=None)
+                    except ValueError:
+                        raise ScryfallError(
+                            response.status, "Response is not JSON"
+                        ) from None
+                    if not isinstance(data, dict):
+                        raise ScryfallError(response.status, "Unexpected response")
+                    if response.status >= 400 or data.get("object") == "error":
+                        raise ScryfallError(response.status, data.get("details", ""))
+
+                    return data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries:
+                    raise ScryfallError(0, str(e) or type(e).__name__) from e
+                await asyncio.sleep(self.backoff * 2**attempt)
+
+    async def named(self, name: str) -> dict:
+        """Look up one card by exact name, raising CardNotFound if there is none"""
+
+        key = name.strip().lower()
+        if key not in self.inflight:
+            task = asyncio.ensure_future(self.fetch_named(name))
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+            self.inflight[key] = task
+
+        return await asyncio.shield(self.inflight[key])
+
+    async def fetch_named(self, name: str) -> dict:
+        try:
+            return await self.request("GET", "/cards/named", params={"exact": name})
+        except ScryfallError as e:
+            if e.status == 404:
+                raise CardNotFound(name, e.details) from None
+            raise
+
+    async def collection(self, names: list[str]) -> tuple[dict[str, dict], list[str]]:
+        """Look up many cards with /cards/collection requests of 75 names each.
+        Returns the cards keyed by the requested names and the names that weren't found.
+        """
+
+        unique = list({name.strip().lower(): name.strip() for name in names}.values())
+        batches = [
+            unique[i : i + batch_size] for i in range(0, len(unique), batch_size)
+        ]
+
+        by_key = {}
+        done = 0
+        for result in asyncio.as_completed(
+            [
+                self.request(
+                    "POST",
+                    "/cards/collection",
+                    json={"identifiers": [{"name": name} for name in batch]},
+                )
+                for batch in batches
+            ]
+        ):
+            for card in (await result).get("data", []):
+                for key in card_keys(card):
+                    by_key.setdefault(key, card)
+            done += 1
+            print(f"        {min(done * batch_size, len(unique))}/{len(unique)}")
+
+        found, missing = {}, []
+        for name in names:
+            if (card := by_key.get(name.strip().lower())) is not None:
+                found[name] = card
+            else:
+                missing.append(name)
+
+        return found, missing
+
+
+def resolve_cards(
+    names: list[str], base_url: str = scryfall_url
+) -> tuple[dict[str, dict], list[str]]:
+    """Resolve card names to ScryFall card objects with batched collection requests"""
+
+    async def resolve() -> tuple[dict[str, dict], list[str]]:
+        async with ScryfallClient(base_url) as client:
+            return await client.collection(list(names))
+
+    return asyncio.run(resolve())
+
+
+def get_cards(names: list[str], base_url: str = scryfall_url) -> dict[str, object]:
+    """Look up cards one name at a time, concurrently within the rate limit.
+    Returns each name's card object, or the CardNotFound raised for it.
+    """
+
+    async def resolve() -> dict[str, object]:
+        async with ScryfallClient(base_url) as client:
+            results = await asyncio.gather(
+                *(client.named(name) for name in names), return_exceptions=True
+            )
+        for result in results:
+            if isinstance(result, Exception) and not isinstance(result, CardNotFound):
+                raise result
+        return dict(zip(names, results))
+
+    return asyncio.run(resolve())
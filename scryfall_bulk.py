@@ -0,0 +1,136 @@
+import json
+import os
+import sqlite3
+from typing import Iterable, Iterator
+
+from card_cache import slim_card
+
+# Global variables
+index_file = "card_index.db"
+whitespace = " \t\r\n,["
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 20) -> Iterator[dict]:
+    """Yield the objects of a top-level JSON array one at a time, reading the file in chunks"""
+
+    decoder = json.JSONDecoder()
+
+    with open(path, "r", encoding="utf-8") as f:
+        buffer, pos = "", 0
+        while True:
+            chunk = f.read(chunk_size)
+            buffer, pos = buffer[pos:] + chunk, 0
+
+            while True:
+                while pos < len(buffer) and buffer[pos] in whitespace:
+                    pos += 1
+                if pos == len(buffer):
+                    break
+                if buffer[pos] == "]":
+                    return
+
+                try:
+                    obj, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # The object continues in the next chunk
+                    if not chunk:
+                        raise
+                    break
+                yield obj
+
+            if not chunk:
+                return
+
+
+class BulkIndex:
+    """Card metadata from a ScryFall bulk data file, indexed in SQLite by normalized
+    card name and by each face name, so frames resolve without any network access
+    """
+
+    def __init__(self, path: str = index_file):
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS cards (name TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS source (path TEXT, size INTEGER, mtime REAL)"
+        )
+
+    def __enter__(self) -> "BulkIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def is_built_from(self, bulk_path: str) -> bool:
+        """Whether the index was built from this exact bulk file"""
+
+        stat = os.stat(bulk_path)
+        row = self.db.execute("SELECT path, size, mtime FROM source").fetchone()
+        return row == (os.path.abspath(bulk_path), stat.st_size, stat.st_mtime)
+
+    def build(self, bulk_path: str) -> int:
+        """Replace the index with the cards in a bulk data file; returns the number of cards"""
+
+        print(f"    Indexing ScryFall bulk data from {bulk_path}")
+        stat = os.stat(bulk_path)
+        n = 0
+
+        with self.db:
+            self.db.execute("DELETE FROM cards")
+            self.db.execute("DELETE FROM source")
+            for card in iter_json_array(bulk_path):
+                data = json.dumps(slim_card(card))
+                self.db.execute(
+                    "INSERT OR REPLACE INTO cards (name, data) VALUES (?, ?)",
+                    (card["name"].lower(), data),
+                )
+                # A full card name takes precedence over another card's face name
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO cards (name, data) VALUES (?, ?)",
+                    (
+                        (face["name"].lower(), data)
+                        for face in card.get("card_faces", [])
+                    ),
+                )
+                n += 1
+            self.db.execute(
+                "INSERT INTO source (path, size, mtime) VALUES (?, ?, ?)",
+                (os.path.abspath(bulk_path), stat.st_size, stat.st_mtime),
+            )
+
+        print(f"    Indexed {n} cards")
+        return n
+
+    def get(self, card: str) -> dict:
+        """Return the metadata for a card name or face name, or None if it isn't indexed"""
+
+        row = self.db.execute(
+            "SELECT data FROM cards WHERE name = ?", (card.strip().lower(),)
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def resolve(self, names: Iterable[str]) -> tuple[dict[str, dict], list[str]]:
+        """Look up many names; returns the cards found and the names that weren't"""
+
+        found, missing = {}, []
+        for name in names:
+            if (card := self.get(name)) is not None:
+                found[name] = card
+            else:
+                missing.append(name)
+
+        return found, missing
+
+
+def load_bulk_index(bulk_path: str, index_path: str = index_file) -> BulkIndex:
+    """Open the bulk data index, rebuilding it only if the bulk file has changed"""
+
+    index = BulkIndex(index_path)
+    if not index.is_built_from(bulk_path):
+        index.build(bulk_path)
+
+    return index
@@ -0,0 +1,129 @@
+"""Synthetic PucaTrade ledger pages and a local server that plays PucaTrade, shared
+by the puca_audit tests and benchmarks
+"""
+
+import http.server
+import random
+import threading
+import time
+import urllib.parse
+from collections import Counter
+
+
+def synthetic_ledger_page(n_transactions: int = 100, month: str = "2016-01") -> str:
+    """Build a page shaped like a PucaTrade ledger page, with a header row and a mix
+    of trades, gifts, fees and transfers; some names have commas or non-ASCII letters.
+    TYPE and POINTS have "label letter" labels but only TYPE a "value letter" value,
+    and points are shown without thousands separators, as the original reports read them.
+    """
+
+    def field(
+        label: str, value: str, label_kind: str = "", value_kind: str = ""
+    ) -> str:
+        return (
+            f'<div class="label{label_kind}">{label}</div>\n'
+            f'<div class="value{value_kind}">{value}</div>\n'
+        )
+
+    def user(i: int) -> str:
+        name = random.choice(("Jöhn Doe", "Smith, Jane", "dude1818", "Ana"))
+        return f"<a href='/profiles/show/{i}'>{name}</a>"
+
+    entries = ['<div class="row header"><div class="column sender">Sender</div></div>']
+    for _ in range(n_transactions):
+        kind = random.choice(("TRADE", "TRADE", "TRADE", "WANT", "PUCASHIELD", "GIFT"))
+        points = random.randint(-2500, 2500)
+        if kind == "GIFT":
+            kind, shown = "TRADE", '<span class="icon icon-gift ">Gift</span>'
+        else:
+            shown = str(points)
+        if kind == "TRADE":
+            notes = (
+                f"<a href='/trades/show/{random.randrange(10**6)}'>Package</a> for"
+                f" <a href='/cards/show/{random.randrange(10**5)}/{random.randrange(10**5)}"
+                f"/{random.randrange(2)}'>Card, Name {random.randrange(30_000)}</a> sent"
+            )
+        else:
+            notes = "Fee"
+        entries.append(
+            '<div class="row"><div class="column sender">'
+            + field("SENDER", user(random.randrange(10**5)))
+            + field("TYPE", kind, " letter", " letter")
+            + field("NOTES", notes)
+            + field("POINTS", shown, " letter")
+            + field(
+                "RUNNING",
+                f'<span class="icon"></span>{random.randrange(10**6):,}',
+            )
+            + field("RECEIVER", user(random.randrange(10**5)))
+            + field(
+                "DATE", f"{month}-{random.randint(10, 28)} 12:{random.randint(10, 59)}"
+            )
+            + "</div></div>"
+        )
+
+    return "<html><body>" + "\n".join(entries) + "</body></html>"
+
+
+def serve_ledger(
+    pages: dict[str, str], latency: float = 0.0, password: str = "pw"
+) -> http.server.HTTPServer:
+    """Serve ledger pages like PucaTrade from a local thread, each after up to latency
+    seconds. POST /login with the password sets the session cookie, and
+    /account/ledger/<month> needs it. Every page lists the links to all months.
+    server.fetched counts the pages served per month; a month in server.fail_once
+    is answered with one 503 first.
+    """
+
+    links = "".join(
+        f'<option href="/account/ledger/{month}">{month}</option>' for month in pages
+    )
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def reply(self, status: int, body: str, headers: dict = None) -> None:
+            data = body.encode("utf-8")
+            self.send_response(status)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            form = urllib.parse.parse_qs(self.rfile.read(length).decode())
+            server.logins += 1
+            if form.get("password") == [password]:
+                self.reply(200, "ok", {"Set-Cookie": "session=valid; Path=/"})
+            else:
+                self.reply(200, "Invalid login")
+
+        def do_GET(self):
+            time.sleep(random.uniform(0, server.latency))
+            if "session=valid" not in self.headers.get("Cookie", ""):
+                self.reply(200, "<html>logged-out</html>")
+                return
+
+            month = self.path.rsplit("/", 1)[-1]
+            month = month if month in pages else next(iter(pages))
+            with server.lock:
+                if month in server.fail_once:
+                    server.fail_once.discard(month)
+                    self.reply(503, "", {"Retry-After": "0"})
+                    return
+                server.fetched[month] += 1
+            self.reply(200, pages[month].replace("<body>", "<body>" + links, 1))
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    server.latency, server.logins = latency, 0
+    server.fetched, server.fail_once = Counter(), set()
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,71 @@
+import json
+import os
+import subprocess
+import sys
+
+import card_search
+from card_names import NameIndex
+
+
+def run_menu(cwd: str, answers: str) -> subprocess.CompletedProcess:
+    script = os.path.join(os.path.dirname(card_search.__file__), "card_search.py")
+    return subprocess.run(
+        [sys.executable, script],
+        input=answers,
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+    )
+
+
+def test_parse_option_before_any_download(tmp_path):
+    (tmp_path / "deck_urls.txt").write_text("deck-a\n")
+
+    result = run_menu(tmp_path, "P\nQ\n")
+
+    assert result.returncode == 0, result.stderr
+    assert "Need to download deck lists first!" in result.stdout
+    assert not (tmp_path / "deck_lists").exists()
+
+
+def test_search_option_before_any_parse(tmp_path):
+    (tmp_path / "deck_urls.txt").write_text("deck-a\n")
+
+    result = run_menu(tmp_path, "S\nQ\n")
+    assert result.returncode == 0, result.stderr
+    assert "Need to parse deck lists first!" in result.stdout
+    assert not (tmp_path / "deck_lists").exists()
+
+    (tmp_path / "deck_lists").mkdir()
+    result = run_menu(tmp_path, "S\nQ\n")
+    assert result.returncode == 0, result.stderr
+    assert "Need to parse deck lists first!" in result.stdout
+    assert not (tmp_path / "deck_lists" / "corpus.db").exists()
+
+
+def test_suggestions_for_each_term_of_a_combined_query():
+    index = NameIndex(["Sol Ring", "Solemn Simulacrum", "Island"])
+
+    assert index.suggest(" sol r") == index.suggest("sol r") == ["sol ring"]
+    assert index.complete(" Sol ") == ["sol ring", "solemn simulacrum"]
+
+
+def test_commands_read_the_given_output_dir(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "decks.txt").write_text("deck-a\ndeck-b\n")
+    (tmp_path / "watch.txt").write_text("Sol Ring\n")
+    (tmp_path / "alt").mkdir()
+    for deck, cards in (("deck-a", "1 Sol Ring||2 Island"), ("deck-b", "1 Island")):
+        (tmp_path / "alt" / f"{deck}.html").write_text(
+            f'<input type="hidden" name="c" value="{cards}">'
+        )
+
+    def run(*args: str) -> object:
+        card_search.main(["--decks", "decks.txt", "--output-dir", "alt", *args])
+        return json.loads(capsys.readouterr().out)
+
+    assert run("parse")["parsed"] == 2
+    assert run("search", "sol ring", "island")[1]["decks"] == ["deck-a", "deck-b"]
+    assert run("game-changers", "--list", "watch.txt") == {"deck-a": 1, "deck-b": 0}
+    assert run("compliance", "--list", "watch=watch.txt")["deck-a"]["watch"]["cards"]
+    assert not (tmp_path / "deck_lists").exists()
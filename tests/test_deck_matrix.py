@@ -0,0 +1,56 @@
+import random
+
+import numpy as np
+
+from card_synergy import SynergyEngine
+from deck_corpus import DeckCorpus
+from deck_matrix import DeckMatrix
+
+deck_dict = {
+    "deck-a": ["sol ring", "2 island", "island", "10 forest"],
+    "deck-b": [],
+    "deck-c": ["island", "sol ring"],
+}
+
+
+def test_copies_match_the_corpus_postings(tmp_path):
+    matrix = DeckMatrix(deck_dict)
+    assert matrix.cards == ["sol ring", "island", "forest"]
+
+    with DeckCorpus(str(tmp_path / "corpus.db")) as corpus:
+        corpus.update(deck_dict)
+        for card in matrix.cards:
+            postings = corpus.decks_with(card)
+            frequency = matrix.card_frequency(postings)
+            assert frequency[matrix.vocab[card]] == sum(postings.values())
+
+
+def partner_counts(engine: SynergyEngine, card: str) -> dict[str, int]:
+    co = engine.counts(card)
+    return {engine.matrix.cards[id]: int(co[id]) for id in np.flatnonzero(co)}
+
+
+def test_synergy_update_matches_a_rebuilt_engine():
+    random.seed(9)
+    names = [f"card {i}" for i in range(40)]
+    decks = {f"deck {i}": random.sample(names, 15) for i in range(60)}
+    engine = SynergyEngine(DeckMatrix(decks))
+    for card in names[:10] + ["card 99"]:
+        engine.counts(card)
+
+    # Ten re-parsed decks and ten new ones, all with a card never seen before
+    changed = {
+        f"deck {i}": random.sample(names, 15) + ["card 99"] for i in range(50, 70)
+    }
+    engine.add_decks(changed)
+    rebuilt = SynergyEngine(DeckMatrix({**decks, **changed}))
+
+    assert engine.matrix.n_decks == 70
+    assert sorted(engine.matrix.decks) == sorted(rebuilt.matrix.decks)
+    # The counts cached before the update were updated rather than recomputed
+    for card in list(engine.cache):
+        assert partner_counts(engine, card) == partner_counts(rebuilt, card)
+    for card in names + ["card 99"]:
+        id, rebuilt_id = engine.matrix.vocab[card], rebuilt.matrix.vocab[card]
+        assert engine.df[id] == rebuilt.df[rebuilt_id]
+        assert engine.top_partners(card) == rebuilt.top_partners(card)
@@ -0,0 +1,140 @@
+import hashlib
+import http.server
+import os
+import threading
+
+import pytest
+
+import card_search
+import deck_pipeline
+from card_search import get_deck_lists, parse_deck_lists, run_pipeline
+from deck_corpus import DeckCorpus, corpus_file
+
+
+def deck_page(*cards: str) -> bytes:
+    value = "||".join(f"1 {card}" for card in cards)
+    return f'<html><input type="hidden" name="c" value="{value}"></html>'.encode()
+
+
+class DeckServer(http.server.ThreadingHTTPServer):
+    """Serves the current page of each deck with an ETag, answering 304 to a matching
+    If-None-Match
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), DeckHandler)
+        self.pages = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+
+class DeckHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = self.server.pages[self.path.lstrip("/")]
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    # The politeness limit is for TappedOut, not a local server
+    monkeypatch.setattr(card_search, "download_rate", 1000.0)
+    monkeypatch.setattr(deck_pipeline, "download_rate", 1000.0)
+
+    server = DeckServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def stored(output_dir: str, deck: str) -> tuple[str, list[str]]:
+    with open(os.path.join(output_dir, deck + ".txt"), "r") as f:
+        text = f.read()
+    with DeckCorpus(os.path.join(output_dir, corpus_file)) as corpus:
+        return text, corpus.load(deck)
+
+
+def test_pipeline_without_html_does_not_leave_stale_pages(server, tmp_path):
+    output_dir = str(tmp_path)
+    decks = ["deck-a", "deck-b"]
+
+    server.pages = {deck: deck_page("Old Card", "Island") for deck in decks}
+    get_deck_lists(output_dir, server.url, deck_names=decks)
+    parse_deck_lists(output_dir, deck_names=decks)
+    assert stored(output_dir, "deck-a") == (
+        "Old Card\nIsland\n",
+        ["old card", "island"],
+    )
+
+    server.pages = {deck: deck_page("New Card", "Island") for deck in decks}
+    run_pipeline(output_dir, server.url, deck_names=decks)
+    assert stored(output_dir, "deck-a") == (
+        "New Card\nIsland\n",
+        ["new card", "island"],
+    )
+
+    # A full parse must not bring back the page saved before the pipeline ran
+    parse_deck_lists(output_dir, incremental=False, deck_names=decks)
+    assert stored(output_dir, "deck-a") == (
+        "New Card\nIsland\n",
+        ["new card", "island"],
+    )
+
+    # Nor may the saved validators make a plain download skip a page that changed back
+    server.pages = {deck: deck_page("Old Card", "Island") for deck in decks}
+    stats = get_deck_lists(output_dir, server.url, deck_names=decks)
+    assert stats["downloaded"] == 2
+    parse_deck_lists(output_dir, deck_names=decks)
+    assert stored(output_dir, "deck-a") == (
+        "Old Card\nIsland\n",
+        ["old card", "island"],
+    )
+
+
+def test_unchanged_pages_are_not_downloaded_again(server, tmp_path):
+    output_dir = str(tmp_path)
+    server.pages = {"deck-a": deck_page("Sol Ring")}
+
+    assert (
+        get_deck_lists(output_dir, server.url, deck_names=["deck-a"])["downloaded"] == 1
+    )
+    assert (
+        get_deck_lists(output_dir, server.url, deck_names=["deck-a"])["unchanged"] == 1
+    )
+
+
+def test_unreadable_page_fails_only_its_own_deck(tmp_path):
+    output_dir = str(tmp_path)
+    decks = ["deck-a", "deck-b", "deck-c"]
+    for deck in ("deck-a", "deck-c"):
+        with open(os.path.join(output_dir, deck + ".html"), "wb") as f:
+            f.write(deck_page("Sol Ring", deck))
+
+    result = parse_deck_lists(output_dir, deck_names=decks)
+    assert result == {"parsed": 2, "skipped": 0, "failed": ["deck-b"]}
+    assert stored(output_dir, "deck-c") == (
+        "Sol Ring\ndeck-c\n",
+        ["sol ring", "deck-c"],
+    )
+    assert not os.path.exists(os.path.join(output_dir, "deck-b.txt"))
+    with DeckCorpus(os.path.join(output_dir, corpus_file)) as corpus:
+        assert "deck-b" not in corpus
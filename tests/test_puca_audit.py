@@ -0,0 +1,321 @@
+import builtins
+import os
+import random
+import re
+import subprocess
+import sys
+from datetime import date
+
+import pytest
+
+import puca_audit
+from ledger_fixtures import serve_ledger, synthetic_ledger_page
+from puca_audit import (
+    LedgerCache,
+    LedgerExport,
+    TransactionSummary,
+    TransactionTable,
+    ValueDistribution,
+    crawl_ledger,
+    get_session,
+    get_urls,
+    parse_ledger_page,
+)
+
+months = [f"{2016 + i // 12}-{i % 12 + 1:02d}" for i in range(18)]
+
+
+def ledger_entry(*fields: tuple[str, str]) -> str:
+    html = '<div class="row"><div class="column sender">'
+    for label, value in fields:
+        label_kind = " letter" if label in ("TYPE", "POINTS") else ""
+        value_kind = " letter" if label == "TYPE" else ""
+        html += f'<div class="label{label_kind}">{label}</div>\n'
+        html += f'<div class="value{value_kind}">{value}</div>\n'
+    return html + "</div></div>\n"
+
+
+golden_page = (
+    '<html><body><div class="row header"><div class="column sender">Sender</div></div>\n'
+    + ledger_entry(
+        ("SENDER", "<a href='/profiles/show/129317'>J\u00f6hn Doe</a>"),
+        ("TYPE", "TRADE"),
+        (
+            "NOTES",
+            "<a href='/trades/show/555'>Package</a> for"
+            " <a href='/cards/show/12/345/0'>Fire, Ice</a> sent",
+        ),
+        ("POINTS", "1250"),
+        ("RUNNING", '<span class="icon"></span>10,000'),
+        ("RECEIVER", "<a href='/profiles/show/42'>Smith, Jane</a>"),
+        ("DATE", "2016-01-18 12:11"),
+    )
+    + ledger_entry(
+        ("SENDER", "<a href='/profiles/show/7'>Ana</a>"),
+        ("TYPE", "TRADE"),
+        ("NOTES", "<a href='/trades/show/556'>Package</a> for a gift"),
+        ("POINTS", '<span class="icon icon-gift ">Gift</span>'),
+        ("RUNNING", '<span class="icon"></span>9,000'),
+        ("RECEIVER", "<a href='/profiles/show/8'>dude1818</a>"),
+        ("DATE", "2016-01-19 09:05"),
+    )
+    + ledger_entry(
+        ("SENDER", "<a href='/profiles/show/7'>Ana</a>"),
+        ("TYPE", "WANT"),
+        ("NOTES", "Promotion fee"),
+        ("POINTS", "-25"),
+        ("RUNNING", '<span class="icon"></span>8,975'),
+        ("RECEIVER", "<a href='/profiles/show/1'>PucaTrade</a>"),
+        ("DATE", "2016-01-20 10:00"),
+    )
+    + "</body></html>"
+)
+
+type_flag = '<div class="label letter">TYPE</div>'
+
+
+def reference_transactions(text: str) -> dict[str, int]:
+    """The T report as the original get_transactions loop computed it for one page"""
+
+    transactions = {}
+    for transaction in text.split(type_flag)[1:]:
+        type = transaction.split('"value letter">')[1].split("</div>")[0]
+        points = (
+            transaction.split("POINTS")[1]
+            .split('"value">')[1]
+            .split("</div>")[0]
+            .strip()
+        )
+        if "Gift" in points:
+            points = 0
+        else:
+            points = int(points)
+
+        if points > 0:
+            type += "_incoming"
+        elif points < 0:
+            type += "_outgoing"
+
+        if type in transactions.keys():
+            transactions[type] += points
+        else:
+            transactions[type] = points
+
+    return transactions
+
+
+def reference_values(text: str) -> tuple[list[int], list[int]]:
+    """The D report as the original get_values loop computed it for one page"""
+
+    sending, receiving = [], []
+    for transaction in text.split(type_flag)[1:]:
+        type = transaction.split('"value letter">')[1].split("</div>")[0]
+
+        if type == "TRADE":
+            points = (
+                transaction.split("POINTS")[1]
+                .split('"value">')[1]
+                .split("</div>")[0]
+                .strip()
+            )
+
+            if "Gift" in points:
+                continue
+            else:
+                points = int(points)
+
+            if points > 0:
+                sending.append(points)
+            else:
+                receiving.append(-1 * points)
+
+    return sending, receiving
+
+
+def reference_reports(text: str) -> tuple[dict, list[int], list[int]]:
+    return reference_transactions(text), *reference_values(text)
+
+
+def reports(text: str) -> tuple[dict, list[int], list[int]]:
+    summary, values = TransactionSummary(), ValueDistribution()
+    for transaction in parse_ledger_page(text):
+        summary.add(transaction)
+        values.add(transaction)
+
+    return summary.transactions, values.sending, values.receiving
+
+
+def test_ledger_page_golden():
+    transactions = parse_ledger_page(golden_page)
+
+    assert [t.csv_row() for t in transactions] == [
+        '555,TRADE,1250,10000,Jhn Doe,129317,"Smith, Jane",42,"Fire, Ice",345,False,2016-01-18,12:11\n',
+        ",GIFT,0,9000,Ana,7,dude1818,8,,,False,2016-01-19,09:05\n",
+        ",TRADE FEE,-25,8975,Ana,7,PucaTrade,1,,,False,2016-01-20,10:00\n",
+    ]
+    assert [t.ledger_type for t in transactions] == ["TRADE", "TRADE", "WANT"]
+    assert transactions[2].notes == "Promotion fee"
+
+
+def test_reports_match_the_original_loops():
+    random.seed(1)
+    text = synthetic_ledger_page(300)
+
+    assert reports(text) == reference_reports(text)
+
+
+def test_malformed_rows_do_not_break_reports():
+    random.seed(2)
+    text = synthetic_ledger_page(300)
+    # Notes without the package and card links, a sender without a profile link,
+    # and a running total and date in other formats
+    text = re.sub(
+        r"<a href='/trades/show/\d+'>Package</a>.*? sent", "Cancelled", text, 20
+    )
+    text = text.replace("/cards/show/", "/cards/", 20)
+    text = text.replace("<a href='/profiles/show/", "<a href='/deleted/", 5)
+    text = text.replace('<span class="icon"></span>', "n/a ", 5)
+
+    assert reports(text) == reference_reports(text)
+
+    transactions = parse_ledger_page(text)
+    unparsed = [t for t in transactions if t.type == "TRADE" and not t.card_id]
+    assert unparsed and all(t.csv_row() for t in unparsed)
+    assert any(t.sender_id == -1 for t in transactions)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    random.seed(3)
+    server = serve_ledger({month: synthetic_ledger_page(40, month) for month in months})
+    monkeypatch.setattr(puca_audit, "root_url", server.url)
+    monkeypatch.setattr(puca_audit, "login_url", server.url + "/login")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def log_in(monkeypatch, password: str = "pw"):
+    answers = iter(["me@example.com", password])
+    monkeypatch.setattr(builtins, "input", lambda *args: next(answers))
+    return get_session()
+
+
+def crawl(session, urls, tmp_path, name: str, **options) -> tuple:
+    summary, values = TransactionSummary(), ValueDistribution()
+    export = LedgerExport(str(tmp_path / name))
+    try:
+        crawl_ledger(session, urls, [summary, values, export], **options)
+    finally:
+        export.close()
+
+    with open(export.csvfilename) as f:
+        return summary.transactions, (values.sending, values.receiving), f.read()
+
+
+def test_login_and_ledger_urls(server, monkeypatch):
+    response, session, account = log_in(monkeypatch)
+
+    assert "logged-out" not in response.text
+    assert get_urls(response) == [f"{server.url}/account/ledger/{m}" for m in months]
+    assert server.logins == 1
+
+    response, session, account = log_in(monkeypatch, "wrong")
+    assert "logged-out" in response.text
+
+
+def test_concurrent_crawl_matches_sequential_crawl(server, monkeypatch, tmp_path):
+    response, session, _ = log_in(monkeypatch)
+    urls = get_urls(response)
+    server.latency = 0.02
+
+    sequential = crawl(session, urls, tmp_path, "sequential.csv", workers=1)
+    server.fetched.clear()
+    server.fail_once.update(months[::5])
+    concurrent = crawl(session, urls, tmp_path, "concurrent.csv", workers=4)
+
+    assert concurrent == sequential
+    assert server.fetched == {month: 1 for month in months}
+    assert server.logins == 1
+
+    # The reports are those of parsing every page in ledger order
+    summary, values = TransactionSummary(), ValueDistribution()
+    for month in months:
+        for transaction in parse_ledger_page(
+            session.get(server.url + "/account/ledger/" + month).text
+        ):
+            summary.add(transaction)
+            values.add(transaction)
+    assert sequential[:2] == (summary.transactions, (values.sending, values.receiving))
+
+
+def test_second_crawl_downloads_only_open_months(server, monkeypatch, tmp_path):
+    response, session, account = log_in(monkeypatch)
+    urls = get_urls(response)
+    # The last two months are the current and last month
+    today = date(*map(int, months[-1].split("-")), 15)
+
+    reports = []
+    for run in range(2):
+        server.fetched.clear()
+        cache = LedgerCache(account, str(tmp_path / "cache"), today)
+        reports.append(crawl(session, urls, tmp_path, f"{run}.csv", cache=cache))
+
+    assert set(server.fetched) == set(months[-2:])
+    assert cache.hits == len(months) - 2
+    assert reports[0] == reports[1]
+
+
+def test_logged_out_session_is_reported(server, tmp_path):
+    from requests import Session
+
+    with pytest.raises(RuntimeError):
+        crawl(
+            Session(), [server.url + "/account/ledger/" + months[0]], tmp_path, "x.csv"
+        )
+
+
+def test_transaction_table_round_trip(tmp_path):
+    random.seed(4)
+    transactions = parse_ledger_page(golden_page) + parse_ledger_page(
+        synthetic_ledger_page(200)
+    )
+    table = TransactionTable()
+    for transaction in transactions:
+        table.add(transaction)
+    table.save(str(tmp_path / "ledger.bin"))
+
+    loaded = list(TransactionTable.load(str(tmp_path / "ledger.bin")))
+    assert [t.csv_row() for t in loaded] == [t.csv_row() for t in transactions]
+    assert [t.ledger_type for t in loaded] == [t.ledger_type for t in transactions]
+
+
+def test_damaged_table_raises_value_error(tmp_path):
+    table = TransactionTable()
+    for transaction in parse_ledger_page(golden_page):
+        table.add(transaction)
+    path = str(tmp_path / "ledger.bin")
+    table.save(path)
+    with open(path, "rb") as f:
+        data = f.read()
+
+    for damaged in (b"not a ledger", data[:14], data[:-5]):
+        with open(path, "wb") as f:
+            f.write(damaged)
+        with pytest.raises(ValueError):
+            TransactionTable.load(path)
+
+
+def test_saved_ledger_option_without_a_saved_ledger(tmp_path):
+    script = os.path.join(os.path.dirname(puca_audit.__file__), "puca_audit.py")
+    result = subprocess.run(
+        [sys.executable, script],
+        input="S\n\n",
+        capture_output=True,
+        text=True,
+        cwd=tmp_path,
+        env=dict(os.environ, MPLBACKEND="Agg"),
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert "Need to export the ledger with E or A first!" in result.stdout
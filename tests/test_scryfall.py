@@ -0,0 +1,283 @@
+import asyncio
+import http.server
+import json
+import socket
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from scryfall import (
+    CardNotFound,
+    ScryfallClient,
+    ScryfallError,
+    batch_size,
+    resolve_cards,
+)
+
+# Cards served by the stub, including a split card and a double-faced card
+stub_cards = [
+    {"object": "card", "name": "Sol Ring", "type_line": "Artifact", "colors": []},
+    {
+        "object": "card",
+        "name": "Fire // Ice",
+        "card_faces": [
+            {"name": "Fire", "type_line": "Instant", "colors": ["R"]},
+            {"name": "Ice", "type_line": "Instant", "colors": ["U"]},
+        ],
+    },
+    {
+        "object": "card",
+        "name": "Delver of Secrets // Insectile Aberration",
+        "card_faces": [
+            {"name": "Delver of Secrets", "type_line": "Creature", "colors": ["U"]},
+            {"name": "Insectile Aberration", "type_line": "Creature", "colors": ["U"]},
+        ],
+    },
+] + [
+    {"object": "card", "name": f"Card {i}", "type_line": "Instant", "colors": ["G"]}
+    for i in range(200)
+]
+
+
+class ScryfallStub(http.server.ThreadingHTTPServer):
+    """Local stand-in for the ScryFall API serving /cards/collection and /cards/named.
+    Every request is logged, the next throttle requests are answered with 429, and
+    the next outages with an HTML 502 page.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.by_name = {}
+        for card in stub_cards:
+            for name in [card["name"]] + [
+                f["name"] for f in card.get("card_faces", [])
+            ]:
+                self.by_name[name.lower()] = card
+        self.requests = []
+        self.throttle = 0
+        self.outages = 0
+        self.latency = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def reply(self, status: int, body: dict, headers: dict = None) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def throttled(self, body) -> bool:
+        server = self.server
+        with server.lock:
+            server.requests.append((self.command, self.path, body, time.monotonic()))
+            if server.throttle:
+                server.throttle -= 1
+                self.reply(429, {"object": "error"}, {"Retry-After": "0"})
+                return True
+            if server.outages:
+                server.outages -= 1
+                page = b"<html><body>502 Bad Gateway</body></html>"
+                self.send_response(502)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+                return True
+        time.sleep(server.latency)
+        return False
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        identifiers = json.loads(self.rfile.read(length))["identifiers"]
+        if self.throttled(identifiers):
+            return
+
+        data, not_found = [], []
+        for identifier in identifiers:
+            if (card := self.server.by_name.get(identifier["name"].lower())) is None:
+                not_found.append(identifier)
+            else:
+                data.append(card)
+        self.reply(200, {"object": "list", "not_found": not_found, "data": data})
+
+    def do_GET(self):
+        name = parse_qs(urlparse(self.path).query)["exact"][0]
+        if self.throttled(name):
+            return
+
+        if (card := self.server.by_name.get(name.lower())) is None:
+            self.reply(
+                404, {"object": "error", "status": 404, "details": "No card found"}
+            )
+        else:
+            self.reply(200, card)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ScryfallStub()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def collection_batches(stub: ScryfallStub) -> list[list[dict]]:
+    return [body for method, _, body, _ in stub.requests if method == "POST"]
+
+
+def test_collection_batches_of_75(stub):
+    names = [f"Card {i}" for i in range(200)]
+    found, missing = resolve_cards(names, stub.url)
+
+    assert sorted(len(batch) for batch in collection_batches(stub)) == [50, 75, 75]
+    assert all(len(batch) <= batch_size for batch in collection_batches(stub))
+    assert found == {name: stub.by_name[name.lower()] for name in names}
+    assert missing == []
+
+
+def test_collection_dedupes_names(stub):
+    found, _ = resolve_cards(["Sol Ring", "sol ring", " Sol Ring"], stub.url)
+
+    assert [len(batch) for batch in collection_batches(stub)] == [1]
+    assert set(found) == {"Sol Ring", "sol ring", " Sol Ring"}
+
+
+def test_face_names_map_to_their_card(stub):
+    names = ["Fire", "Ice", "Fire // Ice", "Insectile Aberration", "Delver of Secrets"]
+    found, missing = resolve_cards(names, stub.url)
+
+    assert missing == []
+    assert found["Fire"]["name"] == found["Ice"]["name"] == "Fire // Ice"
+    assert found["Fire // Ice"]["name"] == "Fire // Ice"
+    assert found["Insectile Aberration"] is found["Delver of Secrets"]
+    assert found["Delver of Secrets"]["name"].startswith("Delver of Secrets //")
+
+
+def test_not_found_names_are_returned(stub):
+    found, missing = resolve_cards(["Sol Ring", "Not A Card", "Also Missing"], stub.url)
+
+    assert list(found) == ["Sol Ring"]
+    assert missing == ["Not A Card", "Also Missing"]
+
+
+def test_429_is_retried(stub):
+    stub.throttle = 2
+    found, missing = resolve_cards(["Sol Ring"], stub.url)
+
+    assert len(stub.requests) == 3
+    assert list(found) == ["Sol Ring"]
+    assert missing == []
+
+
+def run_client(coroutine_function, base_url: str, **options):
+    """Run coroutine_function(client) with a fresh client and return its result"""
+
+    async def run():
+        async with ScryfallClient(base_url, **options) as client:
+            return await coroutine_function(client)
+
+    return asyncio.run(run())
+
+
+def test_named_coalesces_duplicate_lookups(stub):
+    stub.latency = 0.2
+    names = ["Sol Ring", "sol ring", "SOL RING ", "Fire", "Sol Ring"]
+
+    async def lookup(client):
+        return await asyncio.gather(*(client.named(name) for name in names))
+
+    cards = run_client(lookup, stub.url, rate=1000)
+
+    assert sorted(path for _, path, _, _ in stub.requests) == [
+        "/cards/named?exact=Fire",
+        "/cards/named?exact=Sol+Ring",
+    ]
+    assert [card["name"] for card in cards] == ["Sol Ring"] * 3 + ["Fire // Ice"] + [
+        "Sol Ring"
+    ]
+
+
+def test_named_raises_card_not_found(stub):
+    async def lookup(client):
+        return await client.named("Not A Card")
+
+    with pytest.raises(CardNotFound) as error:
+        run_client(lookup, stub.url, rate=1000)
+
+    assert error.value.name == "Not A Card"
+    assert error.value.status == 404
+    assert error.value.details == "No card found"
+
+
+def test_requests_are_paced(stub):
+    rate = 20
+
+    async def lookup(client):
+        return await asyncio.gather(
+            *(client.named(f"Card {i}") for i in range(6)), return_exceptions=True
+        )
+
+    run_client(lookup, stub.url, rate=rate)
+
+    times = sorted(sent for _, _, _, sent in stub.requests)
+    assert len(times) == 6
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert min(gaps) > 0.8 / rate
+    assert times[-1] - times[0] > 5 * 0.9 / rate
+
+
+def test_html_error_page_raises_scryfall_error(stub):
+    stub.outages = 10
+
+    async def lookup(client):
+        return await client.named("Sol Ring")
+
+    with pytest.raises(ScryfallError) as error:
+        run_client(lookup, stub.url, rate=1000, max_retries=2, backoff=0)
+
+    assert error.value.status == 502
+    assert len(stub.requests) == 3
+
+
+def test_html_error_page_is_retried(stub):
+    stub.outages = 2
+
+    async def lookup(client):
+        return await client.named("Sol Ring")
+
+    card = run_client(lookup, stub.url, rate=1000, backoff=0)
+
+    assert card["name"] == "Sol Ring"
+    assert len(stub.requests) == 3
+
+
+def test_connection_errors_raise_scryfall_error():
+    # A port nothing listens on
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    async def lookup(client):
+        return await client.named("Sol Ring")
+
+    with pytest.raises(ScryfallError) as error:
+        run_client(lookup, f"http://127.0.0.1:{port}", rate=1000, backoff=0)
+
+    assert error.value.status == 0